@@ -0,0 +1,69 @@
+"""Times pca_analysis per solver and dtype to show where each solver wins.
+
+Usage: python benchmarks/pca_solvers.py [--sizes 1000 100000 1000000] [--components 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from general_data import dimension_names, no_overall_indices  # noqa: E402
+from pca_tools import pca_analysis  # noqa: E402
+from synthetic import synthetic_matrix  # noqa: E402
+
+SOLVERS = ("full", "covariance_eigh", "randomized", "auto")
+DTYPES = (np.float64, np.float32)
+
+
+def time_solver(data, solver, dtype, n_components, repeats):
+    best = float("inf")
+    tracemalloc.start()
+    for _ in range(repeats):
+        start = time.perf_counter()
+        pca_analysis(
+            data,
+            dimension_names,
+            n_components,
+            no_overall_indices,
+            solver=solver,
+            dtype=dtype,
+        )
+        best = min(best, time.perf_counter() - start)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--components", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    print(
+        f"{'n_samples':>10} {'solver':>16} {'dtype':>8} {'seconds':>9} {'peak MB':>9}"
+    )
+    for n_samples in args.sizes:
+        data = synthetic_matrix(n_samples)
+        for solver in SOLVERS:
+            for dtype in DTYPES:
+                seconds, peak = time_solver(
+                    data, solver, dtype, args.components, args.repeats
+                )
+                print(
+                    f"{n_samples:>10} {solver:>16} {np.dtype(dtype).name:>8} "
+                    f"{seconds:>9.4f} {peak / 2**20:>9.1f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
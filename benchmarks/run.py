@@ -0,0 +1,242 @@
+"""Times every analysis and rendering hot path on synthetic populations.
+
+Usage: python benchmarks/run.py [--sizes 1000 100000 1000000] [--cases pca_analysis ...]
+                                [--output results.json] [--compare baseline.json]
+
+Each case reports the best wall time over --repeats runs and the tracemalloc
+peak of one extra traced run. Results are written as JSON, and --compare
+prints the time and memory ratios against an earlier results file.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from general_data import (  # noqa: E402
+    dark_dimension_names,
+    dimension_names,
+    no_overall_indices,
+)
+from k_cluster import clusterencodingdraw, kclusterencoding  # noqa: E402
+from pca_tools import pca_analysis  # noqa: E402
+from personality_profile import PersonalityProfile  # noqa: E402
+from plain_values import (  # noqa: E402
+    print_correlation_matrix,
+    print_covariance_matrix,
+)
+from plot_pca import plot_pca  # noqa: E402
+from profile_store import ProfileStore  # noqa: E402
+from render import set_render_mode  # noqa: E402
+from synthetic import (  # noqa: E402
+    SyntheticProfiles,
+    synthetic_dark_matrix,
+    synthetic_labels,
+    synthetic_matrix,
+)
+
+
+def _construct_profiles(population):
+    for profile in population["profiles"].values():
+        PersonalityProfile(profile)
+
+
+def _build_matrix(population):
+    ProfileStore.from_profiles(population["profiles"], dimension_names)
+
+
+def _build_dark_matrix(population):
+    ProfileStore.from_profiles(population["dark_profiles"], dark_dimension_names)
+
+
+def _pca(population):
+    pca_analysis(population["matrix"], dimension_names, 3, no_overall_indices)
+
+
+def _kcluster(population):
+    kclusterencoding(population["matrix"], 3)
+
+
+def _print_quietly(printer, matrix="matrix", names=dimension_names):
+    def run(population):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            printer(population[matrix], names)
+
+    return run
+
+
+def _plot_pca_3d(population):
+    plot_pca(population["pca"], population["labels"], "Benchmark", "bench_pca_3d", 3)
+
+
+def _plot_pca_2d(population):
+    plot_pca(
+        population["pca"][:, :2], population["labels"], "Benchmark", "bench_pca_2d", 2
+    )
+
+
+def _cluster_draw(population):
+    distances, closest = population["encoding"]
+    clusterencodingdraw(distances, closest, population["labels"], k=3)
+
+
+CASES = {
+    "profile_construction": _construct_profiles,
+    "matrix_build": _build_matrix,
+    "pca_analysis": _pca,
+    "kclusterencoding": _kcluster,
+    "print_covariance_matrix": _print_quietly(print_covariance_matrix),
+    "print_correlation_matrix": _print_quietly(print_correlation_matrix),
+    "dark_matrix_build": _build_dark_matrix,
+    "dark_print_correlation_matrix": _print_quietly(
+        print_correlation_matrix, "dark_matrix", dark_dimension_names
+    ),
+    "plot_pca_2d_headless": _plot_pca_2d,
+    "plot_pca_3d_headless": _plot_pca_3d,
+    "clusterencodingdraw_headless": _cluster_draw,
+}
+
+
+def make_population(n_samples, cases):
+    """Inputs for the requested cases; derived inputs are only computed when needed."""
+    matrix = synthetic_matrix(n_samples)
+    population = {
+        "matrix": matrix,
+        "labels": synthetic_labels(n_samples),
+        "profiles": SyntheticProfiles(matrix),
+    }
+    if any(case.startswith("dark_") for case in cases):
+        dark_matrix = synthetic_dark_matrix(n_samples)
+        population["dark_matrix"] = dark_matrix
+        population["dark_profiles"] = SyntheticProfiles(
+            dark_matrix, dark_dimension_names
+        )
+    if any(case.startswith("plot_pca") for case in cases):
+        population["pca"], _ = pca_analysis(
+            matrix, dimension_names, 3, no_overall_indices
+        )
+    if "clusterencodingdraw_headless" in cases:
+        population["encoding"] = kclusterencoding(matrix, 3)
+    return population
+
+
+def measure(function, population, repeats, trace_memory):
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(population)
+        best = min(best, time.perf_counter() - start)
+    peak = None
+    if trace_memory:
+        tracemalloc.start()
+        function(population)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return best, peak
+
+
+def current_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as handle:
+        baseline = {
+            (entry["case"], entry["n_samples"]): entry
+            for entry in json.load(handle)["results"]
+        }
+    print(f"\nCompared with {baseline_path}:")
+    print(f"{'case':>30} {'n_samples':>10} {'time x':>8} {'memory x':>9}")
+    for entry in results:
+        old = baseline.get((entry["case"], entry["n_samples"]))
+        if old is None:
+            continue
+        time_ratio = entry["seconds"] / old["seconds"]
+        memory_ratio = (
+            entry["peak_bytes"] / old["peak_bytes"]
+            if entry["peak_bytes"] and old["peak_bytes"]
+            else float("nan")
+        )
+        print(
+            f"{entry['case']:>30} {entry['n_samples']:>10} "
+            f"{time_ratio:>8.2f} {memory_ratio:>9.2f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[1_000, 100_000, 1_000_000]
+    )
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES), default=None)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", help="JSON results path")
+    parser.add_argument("--compare", help="Earlier JSON results to compare with")
+    args = parser.parse_args()
+
+    cases = args.cases or list(CASES)
+    output_dir = tempfile.mkdtemp(prefix="personality_bench_")
+    set_render_mode("headless", output_dir)
+
+    results = []
+    print(f"{'case':>30} {'n_samples':>10} {'seconds':>9} {'peak MB':>9}")
+    for n_samples in args.sizes:
+        population = make_population(n_samples, cases)
+        for case in cases:
+            seconds, peak = measure(
+                CASES[case], population, args.repeats, not args.no_memory
+            )
+            results.append(
+                {
+                    "case": case,
+                    "n_samples": n_samples,
+                    "seconds": seconds,
+                    "peak_bytes": peak,
+                }
+            )
+            peak_text = "-" if peak is None else f"{peak / 2**20:.1f}"
+            print(f"{case:>30} {n_samples:>10} {seconds:>9.4f} {peak_text:>9}")
+
+    report = {
+        "commit": current_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        ROOT, "benchmarks", "results", f"{report['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as handle:
+        json.dump(report, handle, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Synthetic respondent populations shaped like the real profile data."""
+
+from collections.abc import Mapping
+
+import numpy as np
+
+from general_data import dark_dimension_names, dimension_names
+
+
+def synthetic_matrix(n_samples, n_features=len(dimension_names), rank=5, seed=0):
+    """Low-rank scores in [0, 100] with noise, shaped like the profile matrix."""
+    rng = np.random.default_rng(seed)
+    latent = rng.normal(size=(n_samples, rank)) @ rng.normal(size=(rank, n_features))
+    noise = rng.normal(scale=0.5, size=(n_samples, n_features))
+    return np.clip(50 + 10 * (latent + noise), 0, 100).astype(np.float32)
+
+
+def synthetic_labels(n_samples):
+    return np.array([f"respondent_{i}" for i in range(n_samples)])
+
+
+class SyntheticProfiles(Mapping):
+    """``{label: profile}`` mapping that builds each PersonalityProfileTemplate
+    dict on access, so a million respondents never exist as dicts at once.
+    """
+
+    def __init__(self, matrix, names=dimension_names):
+        self.matrix = matrix
+        self.names = list(names)
+        self._traits = [
+            (name[: -len("_overall")], i)
+            for i, name in enumerate(self.names)
+            if name.endswith("_overall")
+        ]
+
+    def __len__(self):
+        return len(self.matrix)
+
+    def __iter__(self):
+        return (f"respondent_{i}" for i in range(len(self.matrix)))
+
+    def __getitem__(self, label):
+        return self._profile(self.matrix[int(label.rsplit("_", 1)[1])])
+
+    def _profile(self, row):
+        values = row.astype(int).tolist()
+        if not self._traits:
+            # Flat profiles such as dark_generic.template
+            return dict(zip(self.names, values))
+        width = len(self.names) // len(self._traits)
+        return {
+            trait: {
+                "overall": values[start],
+                "sub": dict(
+                    zip(
+                        self.names[start + 1 : start + width],
+                        values[start + 1 : start + width],
+                    )
+                ),
+            }
+            for trait, start in self._traits
+        }
+
+
+def synthetic_dark_matrix(n_samples, seed=0):
+    """Dark Triad scores shaped like dark_generic.template."""
+    return synthetic_matrix(n_samples, len(dark_dimension_names), rank=2, seed=seed)
@@ -0,0 +1,141 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from distances import squared_distances
+from instrumentation import instrumented
+from personality_profile import PersonalityProfile, invalid_cells, validate_batch
+from profile_store import flatten_profile
+
+
+class Assignment(NamedTuple):
+    clusters: np.ndarray
+    distances: np.ndarray
+    coordinates: np.ndarray
+
+
+class ClusterModel:
+    """Fitted cluster centers and PCA projection, persisted as plain arrays.
+
+    Assigning new profiles only needs numpy: sklearn is imported by ``fit`` alone,
+    so a loaded model classifies respondents without refitting or importing it.
+    """
+
+    def __init__(self, centers, components, mean, dimension_names, indices=None):
+        self.centers = np.asarray(centers, dtype=np.float64)
+        self.components = np.asarray(components, dtype=np.float64)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.dimension_names = [str(name) for name in dimension_names]
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.intp)
+        self.column_index = {name: i for i, name in enumerate(self.dimension_names)}
+        # Precomputed pieces of the distance and projection products
+        self._center_norms = np.einsum("ij,ij->i", self.centers, self.centers)
+        self._projection = np.ascontiguousarray(self.components.T)
+        self._projected_mean = self.mean @ self._projection
+
+    @classmethod
+    @instrumented
+    def fit(
+        cls, data, dimension_names, indices=None, k=3, n_components=3, backend="auto"
+    ):
+        """Fit k-means and PCA on the (column-selected) data matrix."""
+        from sklearn.decomposition import PCA
+        from k_cluster import make_kmeans
+
+        selected = data if indices is None else data[:, indices]
+        kmeans = make_kmeans(k, len(selected), backend).fit(selected)
+        pca = PCA(n_components=n_components, random_state=42).fit(selected)
+        return cls(
+            kmeans.cluster_centers_,
+            pca.components_,
+            pca.mean_,
+            dimension_names,
+            indices,
+        )
+
+    def save(self, path):
+        """Save the model arrays to an .npz file."""
+        np.savez(
+            path,
+            centers=self.centers,
+            components=self.components,
+            mean=self.mean,
+            dimension_names=np.asarray(self.dimension_names, dtype=str),
+            indices=np.asarray([] if self.indices is None else self.indices),
+            has_indices=self.indices is not None,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a model saved with ``save``."""
+        with np.load(path) as saved:
+            return cls(
+                saved["centers"],
+                saved["components"],
+                saved["mean"],
+                saved["dimension_names"].tolist(),
+                saved["indices"] if saved["has_indices"] else None,
+            )
+
+    def to_row(self, profile):
+        """Convert a PersonalityProfile, nested/flat profile dict or array to a full row.
+
+        Dict values are validated like PersonalityProfile values (floats in
+        (0, 1] are scaled to scores); invalid values raise a ValueError.
+        """
+        if isinstance(profile, PersonalityProfile):
+            return profile.to_np_array()
+        if isinstance(profile, dict):
+            row, integer_mask = self._raw_row(profile)
+            validation = validate_batch(row[None], integer_mask[None])
+            if validation.errors[0]:
+                cells = invalid_cells(validation.cell_reasons[0], self.dimension_names)
+                raise ValueError(f"Invalid values: {', '.join(cells)}.")
+            return validation.values[0].astype(np.float64)
+        return np.asarray(profile, dtype=np.float64)
+
+    def _raw_row(self, profile):
+        """
+        Lay a nested/flat profile dict out as an unvalidated full row.
+
+        Non-numeric values become NaN, so validate_batch reports them.
+
+        Returns:
+        - A tuple of (row, integer mask) for validate_batch.
+        """
+        row = np.zeros(len(self.dimension_names))
+        integer_mask = np.ones(len(self.dimension_names), dtype=bool)
+        for name, value in flatten_profile(profile):
+            column = self.column_index.get(name)
+            if column is None:
+                raise ValueError(f"Unknown dimension '{name}'.")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                value = np.nan
+            row[column] = value
+            integer_mask[column] = isinstance(value, int)
+        return row, integer_mask
+
+    @instrumented
+    def assign_batch(self, matrix):
+        """
+        Assign rows of a (n, len(dimension_names)) matrix to clusters.
+
+        Returns:
+        - An Assignment of cluster ids (n,), center distances (n, k) and PCA
+          coordinates (n, n_components).
+        """
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if matrix.ndim == 1:
+            matrix = matrix[None, :]
+        if self.indices is not None:
+            matrix = matrix[:, self.indices]
+        squared = squared_distances(matrix, self.centers, self._center_norms)
+        distances = np.sqrt(squared, out=squared)
+        coordinates = matrix @ self._projection
+        coordinates -= self._projected_mean
+        return Assignment(distances.argmin(axis=1), distances, coordinates)
+
+    def assign(self, profile):
+        """Assign a single profile, returning (cluster id, distances, PCA coordinates)."""
+        clusters, distances, coordinates = self.assign_batch(self.to_row(profile))
+        return Assignment(int(clusters[0]), distances[0], coordinates[0])
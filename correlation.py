@@ -0,0 +1,208 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from instrumentation import instrumented
+from shared_array import SharedArray, attach
+
+DEFAULT_CHUNK_SIZE = 65536
+
+
+class MomentAccumulator:
+    """Running count, mean and co-moment matrix of a stream of rows.
+
+    Chunks are folded in with the pairwise update of Chan et al., which stays
+    accurate where raw sums of squares would cancel, and two accumulators built
+    on different shards merge the same way. With ``diagonal`` only the
+    per-column sums of squared deviations are kept, as an (n_features,) vector.
+    """
+
+    def __init__(self, n_features, diagonal=False):
+        self.count = 0
+        self.diagonal = diagonal
+        self.mean = np.zeros(n_features)
+        shape = n_features if diagonal else (n_features, n_features)
+        self.comoment = np.zeros(shape)
+
+    def update(self, chunk):
+        """Fold a (rows, n_features) chunk into the statistics."""
+        chunk = np.asarray(chunk, dtype=np.float64)
+        if len(chunk) == 0:
+            return self
+        other = MomentAccumulator(chunk.shape[1], self.diagonal)
+        other.count = len(chunk)
+        other.mean = chunk.mean(axis=0)
+        centered = chunk - other.mean
+        if self.diagonal:
+            other.comoment = np.einsum("ij,ij->j", centered, centered)
+        else:
+            other.comoment = centered.T @ centered
+        return self.merge(other)
+
+    def merge(self, other):
+        """Merge the statistics of another accumulator into this one."""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        spread = delta**2 if self.diagonal else np.outer(delta, delta)
+        self.comoment += other.comoment + spread * (self.count * other.count / total)
+        self.mean += delta * (other.count / total)
+        self.count = total
+        return self
+
+    def covariance(self, ddof=1):
+        return self.comoment / (self.count - ddof)
+
+    def correlation(self):
+        std = np.sqrt(np.diag(self.comoment))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self.comoment / np.outer(std, std)
+
+
+@instrumented
+def accumulate(data, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Build a MomentAccumulator over data (array or memmap) one row chunk at a time."""
+    accumulator = MomentAccumulator(data.shape[1])
+    for start in range(0, len(data), chunk_size):
+        accumulator.update(data[start : start + chunk_size])
+    return accumulator
+
+
+def _open_source(source):
+    kind, spec = source
+    if kind == "memmap":
+        filename, dtype, offset, shape = spec
+        return None, np.memmap(filename, np.dtype(dtype), "r", offset, shape)
+    return attach(spec)
+
+
+def _accumulate_shard(source, start, stop, chunk_size):
+    shm, data = _open_source(source)
+    try:
+        return accumulate(data[start:stop], chunk_size)
+    finally:
+        del data
+        if shm is not None:
+            shm.close()
+
+
+def _file_offset(data):
+    """Byte offset in its file of where a (possibly sliced) memmap starts, or None.
+
+    ``memmap.offset`` keeps the offset of the original mapping when the array
+    is sliced, so the position is measured from the data address of the memmap
+    that opened the file, found through the ``base`` chain.
+    """
+    if (
+        not isinstance(data, np.memmap)
+        or not data.filename
+        or not data.flags.c_contiguous
+    ):
+        return None
+    opened = data
+    while isinstance(opened.base, np.ndarray):
+        opened = opened.base
+    if not isinstance(opened, np.memmap):
+        return None
+    address = data.__array_interface__["data"][0]
+    return opened.offset + address - opened.__array_interface__["data"][0]
+
+
+@instrumented
+def accumulate_parallel(data, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=None):
+    """
+    Build a MomentAccumulator over row shards in worker processes and merge them.
+
+    Memory-mapped files are reopened by every worker; in-memory arrays are shared
+    once through shared memory instead of being pickled per shard.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    bounds = np.linspace(0, len(data), max_workers + 1).astype(int)
+    shared = None
+    offset = _file_offset(data)
+    if offset is not None:
+        source = ("memmap", (data.filename, data.dtype.str, offset, data.shape))
+    else:
+        shared = SharedArray(data)
+        source = ("shared", shared.spec)
+    try:
+        with ProcessPoolExecutor(max_workers) as pool:
+            futures = [
+                pool.submit(_accumulate_shard, source, start, stop, chunk_size)
+                for start, stop in zip(bounds[:-1], bounds[1:])
+                if stop > start
+            ]
+            accumulator = MomentAccumulator(data.shape[1])
+            for future in futures:
+                accumulator.merge(future.result())
+    finally:
+        if shared is not None:
+            shared.close()
+    return accumulator
+
+
+def rank_columns(data):
+    """Rank every column separately, giving tied values their average rank."""
+    data = np.asarray(data)
+    ranks = np.empty(data.shape)
+    for column in range(data.shape[1]):
+        values = data[:, column]
+        ordered = np.sort(values)
+        left = np.searchsorted(ordered, values, side="left")
+        right = np.searchsorted(ordered, values, side="right")
+        ranks[:, column] = (left + right + 1) / 2
+    return ranks
+
+
+@instrumented
+def covariance_matrix(data, chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1):
+    """Sample covariance matrix of the columns of data."""
+    return _accumulator(data, chunk_size, max_workers).covariance()
+
+
+@instrumented
+def correlation_matrix(
+    data, method="pearson", chunk_size=DEFAULT_CHUNK_SIZE, max_workers=1
+):
+    """Pearson or Spearman correlation matrix of the columns of data."""
+    if method == "spearman":
+        # Ranks need whole columns, the correlation of the ranks streams as usual
+        data = rank_columns(data)
+    elif method != "pearson":
+        raise ValueError('method must be "pearson" or "spearman".')
+    return _accumulator(data, chunk_size, max_workers).correlation()
+
+
+def _accumulator(data, chunk_size, max_workers):
+    if max_workers == 1:
+        return accumulate(data, chunk_size)
+    return accumulate_parallel(data, chunk_size, max_workers)
+
+
+def format_matrix(matrix, dimension_names, title, precision=2, column_names=None):
+    """Format a labelled matrix as one block of text.
+
+    Rows are labelled with ``dimension_names`` and columns with ``column_names``,
+    which default to the row names for a square matrix.
+    """
+    if column_names is None:
+        column_names = dimension_names
+    lines = [f"{title}:", "  " + "  ".join(column_names)]
+    for name, row in zip(dimension_names, matrix):
+        lines.append(f"{name} " + " ".join(f"{value:.{precision}f}" for value in row))
+    return "\n".join(lines)
+
+
+def write_matrix(matrix, dimension_names, path):
+    """Write a matrix to .npy, or to .csv with a header row and a name column."""
+    if path.endswith(".npy"):
+        np.save(path, matrix)
+    elif path.endswith(".csv"):
+        with open(path, "w", encoding="utf-8") as handle:
+            handle.write(",".join(["", *dimension_names]) + "\n")
+            for name, row in zip(dimension_names, matrix):
+                handle.write(name + "," + ",".join(repr(float(v)) for v in row) + "\n")
+    else:
+        raise ValueError("path must end in .npy or .csv")
@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def squared_distances(rows, centers, center_norms=None, out=None):
+    """
+    Squared Euclidean distance of every row to every center.
+
+    Uses ||x||^2 - 2 x.c + ||c||^2, so the cost is one matrix product and no
+    (n, d) temporary is allocated per center. Rounding can make the expansion
+    slightly negative, so results are clipped at 0.
+
+    Parameters:
+    - rows: A (n, d) array.
+    - centers: A (k, d) array.
+    - center_norms: The precomputed squared norms of the centers, if available.
+    - out: An optional (n, k) array to write the result into.
+
+    Returns:
+    - A (n, k) array of squared distances.
+    """
+    if center_norms is None:
+        center_norms = np.einsum("ij,ij->i", centers, centers)
+    squared = np.matmul(rows, centers.T, out=out)
+    squared *= -2
+    squared += np.einsum("ij,ij->i", rows, rows)[:, None]
+    squared += center_norms
+    return np.maximum(squared, 0, out=squared)
@@ -1,7 +1,12 @@
-import numpy as np
-from personality_profile import PersonalityProfile
-from raw_data import names
-from raw_dark import dark_names
+import importlib
+import importlib.util
+import os
+import warnings
+from functools import lru_cache
+
+import profile_cache
+from instrumentation import instrumented
+from profile_store import ProfileStore
 
 
 dimension_names = [
@@ -56,12 +61,84 @@ no_overall_indices = [
     i for i in range(len(dimension_names)) if i not in overall_indices
 ]
 
-data = np.array([PersonalityProfile(profile).to_np_array() for profile in names.values()])
-labels = list(names.keys())
 
-# Dark Triad data
-dark_data = np.array([list(profile.values()) for profile in dark_names.values()])
-dark_labels = list(dark_names.keys())
+@lru_cache(maxsize=None)
+@instrumented
+def load_big_five(source=None, use_cache=True):
+    """Build the Big Five profile store on first call and return the cached store.
+
+    ``source`` is an optional JSONL/CSV export to stream in instead of ``raw_data``.
+    With ``use_cache`` the matrix is memory-mapped from the on-disk profile cache.
+    """
+    return _load("big_five", source, "raw_data", "names", dimension_names, use_cache)
+
+
+@lru_cache(maxsize=None)
+@instrumented
+def load_dark_triad(source=None, use_cache=True):
+    """Build the Dark Triad profile store on first call and return the cached store.
+
+    ``source`` is an optional JSONL/CSV export to stream in instead of ``raw_dark``.
+    With ``use_cache`` the matrix is memory-mapped from the on-disk profile cache.
+    """
+    return _load(
+        "dark_triad", source, "raw_dark", "dark_names", dark_dimension_names, use_cache
+    )
+
+
+def _load(name, source, module, attribute, names, use_cache):
+    if source is not None:
+        path = source
+
+        def build():
+            return _ingest_export(source, names)
+
+    else:
+        # Locate the module without importing it so cache hits never parse it
+        spec = importlib.util.find_spec(module)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named '{module}'", name=module)
+        path = spec.origin
+
+        def build():
+            profiles = getattr(importlib.import_module(module), attribute)
+            return ProfileStore.from_profiles(profiles, names)
+
+    if not use_cache:
+        return build()
+    return profile_cache.cached_store(
+        f"{name}.{os.path.basename(path)}", [path], names, build
+    )
+
+
+def _ingest_export(source, names):
+    from profile_ingest import ingest
+
+    store, errors = ingest(source, names)
+    for error in errors:
+        warnings.warn(f"{source}:{error.line}: {error.message}")
+    return store
+
+
+# Module attributes that are materialized on first access
+_lazy_attributes = {
+    "store": (load_big_five, None),
+    "data": (load_big_five, "data"),
+    "labels": (load_big_five, "labels"),
+    "dark_store": (load_dark_triad, None),
+    "dark_data": (load_dark_triad, "data"),
+    "dark_labels": (load_dark_triad, "labels"),
+}
+
+
+def __getattr__(name):
+    try:
+        loader, attribute = _lazy_attributes[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    store = loader()
+    return store if attribute is None else getattr(store, attribute)
+
 
 # Define the template for the personality profile
 template = {
@@ -0,0 +1,193 @@
+import atexit
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Set PERSONALITY_PROFILE to an output path to record every instrumented call
+# of the run and write them there as a Chrome trace on exit
+_settings = {
+    "enabled": False,
+    "trace_memory": False,
+    "output": os.environ.get("PERSONALITY_PROFILE") or None,
+}
+_records = []
+_local = threading.local()
+_origin = time.perf_counter()
+
+
+def enable(output=None, trace_memory=True):
+    """Start recording instrumented calls, optionally with tracemalloc peaks.
+
+    With ``output`` the records are written there when the process exits.
+    """
+    _settings["enabled"] = True
+    _settings["trace_memory"] = trace_memory
+    if output is not None:
+        _settings["output"] = output
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _settings["enabled"] = False
+    if _settings["trace_memory"] and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _settings["trace_memory"] = False
+
+
+def is_enabled():
+    return _settings["enabled"]
+
+
+def records():
+    """The recorded calls, in completion order."""
+    return list(_records)
+
+
+def reset():
+    _records.clear()
+
+
+def _max_rss_bytes():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+def _shapes(args, kwargs):
+    shapes = {}
+    for name, value in list(enumerate(args)) + list(kwargs.items()):
+        shape = getattr(value, "shape", None)
+        if shape is not None:
+            shapes[str(name)] = list(shape)
+    return shapes
+
+
+@contextmanager
+def span(name, **details):
+    """Record the wall time, CPU time and memory growth of a block under ``name``."""
+    if not _settings["enabled"]:
+        yield
+        return
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    trace_memory = _settings["trace_memory"] and tracemalloc.is_tracing()
+    # [traced bytes at entry, highest peak reached inside nested spans]
+    frame = [0, 0]
+    if trace_memory:
+        current, peak = tracemalloc.get_traced_memory()
+        frame[0] = current
+        if stack:
+            # Keep the peak the parent reached so far, reset_peak discards it
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+    stack.append(frame)
+    rss = _max_rss_bytes()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        record = {
+            "name": name,
+            "start": start - _origin,
+            "wall": wall,
+            "cpu": cpu,
+            "max_rss_delta": _max_rss_bytes() - rss,
+            "thread": threading.get_ident(),
+            "depth": len(stack) - 1,
+        }
+        stack.pop()
+        if trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], frame[1])
+            record["traced_peak"] = peak - frame[0]
+            if stack:
+                stack[-1][1] = max(stack[-1][1], peak)
+        record.update(details)
+        _records.append(record)
+
+
+def instrumented(function=None, name=None):
+    """Decorator recording every call of a function as a span with its input shapes.
+
+    While recording is disabled the wrapper only checks one flag.
+    """
+    if function is None:
+        return functools.partial(instrumented, name=name)
+    name = name or function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not _settings["enabled"]:
+            return function(*args, **kwargs)
+        with span(name, shapes=_shapes(args, kwargs)):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+def chrome_trace(recorded=None):
+    """The records as a Chrome trace (chrome://tracing, Perfetto) JSON object."""
+    recorded = records() if recorded is None else recorded
+    pid = os.getpid()
+    events = []
+    for record in recorded:
+        args = {
+            key: value
+            for key, value in record.items()
+            if key not in ("name", "start", "wall", "thread")
+        }
+        events.append(
+            {
+                "name": record["name"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["wall"] * 1e6,
+                "pid": pid,
+                "tid": record["thread"],
+                "args": args,
+            }
+        )
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def dump(path=None):
+    """Write the records of this run as a Chrome trace JSON file."""
+    path = path or _settings["output"]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f)
+    return path
+
+
+def summary():
+    """Total and per-call wall/CPU time per instrumented name, slowest first."""
+    totals = {}
+    for record in _records:
+        total = totals.setdefault(record["name"], [0, 0.0, 0.0])
+        total[0] += 1
+        total[1] += record["wall"]
+        total[2] += record["cpu"]
+    lines = [f"{'name':>40} {'calls':>6} {'wall s':>9} {'cpu s':>9}"]
+    for name, (calls, wall, cpu) in sorted(totals.items(), key=lambda i: -i[1][1]):
+        lines.append(f"{name:>40} {calls:>6} {wall:>9.3f} {cpu:>9.3f}")
+    return "\n".join(lines)
+
+
+def _dump_at_exit():
+    if _settings["enabled"] and _settings["output"] and _records:
+        dump()
+
+
+atexit.register(_dump_at_exit)
+
+if _settings["output"]:
+    enable(trace_memory=os.environ.get("PERSONALITY_PROFILE_MEMORY", "1") != "0")
@@ -0,0 +1,123 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from correlation import accumulate, format_matrix
+from general_data import (
+    dark_dimension_names,
+    dimension_names,
+    load_big_five,
+    load_dark_triad,
+)
+from instrumentation import instrumented
+
+
+class LabelIndex:
+    """Label to row lookup over a sorted copy of the labels.
+
+    Lookups are a vectorized binary search, so resolving millions of labels
+    needs no per-label Python work. Duplicate labels resolve to their first row.
+    """
+
+    def __init__(self, labels):
+        labels = np.asarray(labels, dtype=str)
+        order = np.argsort(labels, kind="stable")
+        sorted_labels = labels[order]
+        first = np.ones(len(sorted_labels), dtype=bool)
+        first[1:] = sorted_labels[1:] != sorted_labels[:-1]
+        self.sorted_labels = sorted_labels[first]
+        self.rows = order[first]
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, labels):
+        """Row of every label, -1 where the label is not indexed."""
+        labels = np.asarray(labels, dtype=str)
+        if len(self.rows) == 0:
+            return np.full(labels.shape, -1, dtype=np.intp)
+        positions = np.searchsorted(self.sorted_labels, labels)
+        clipped = np.minimum(positions, len(self.rows) - 1)
+        found = (positions < len(self.rows)) & (self.sorted_labels[clipped] == labels)
+        return np.where(found, self.rows[clipped], -1)
+
+
+class JointData(NamedTuple):
+    data: np.ndarray
+    mask: np.ndarray
+    labels: np.ndarray
+    dimension_names: list
+
+
+@instrumented
+def join_datasets(big_five=None, dark_triad=None, how="inner"):
+    """
+    Join the Big Five and Dark Triad datasets on their labels.
+
+    Parameters:
+    - big_five: The Big Five ProfileStore (defaults to load_big_five()).
+    - dark_triad: The Dark Triad ProfileStore (defaults to load_dark_triad()).
+    - how: "inner" keeps labels present in both, "outer" keeps every label and
+      "left" keeps every Big Five label. Inner and outer joins are in label
+      order, a left join keeps the row order of the Big Five store.
+
+    Returns:
+    - A JointData with the (n, 35 + 4) float32 matrix (NaN where missing), its
+      presence mask, the joined labels and the combined dimension names.
+    """
+    big_five = big_five if big_five is not None else load_big_five()
+    dark_triad = dark_triad if dark_triad is not None else load_dark_triad()
+    big_index = LabelIndex(big_five.labels)
+    dark_index = LabelIndex(dark_triad.labels)
+
+    if how == "inner":
+        labels = np.intersect1d(big_index.sorted_labels, dark_index.sorted_labels)
+    elif how == "outer":
+        labels = np.union1d(big_index.sorted_labels, dark_index.sorted_labels)
+    elif how == "left":
+        # Back to the Big Five store order, first occurrence of every label
+        labels = big_index.sorted_labels[np.argsort(big_index.rows)]
+    else:
+        raise ValueError('how must be "inner", "outer" or "left".')
+
+    width = big_five.data.shape[1]
+    data = np.full((len(labels), width + dark_triad.data.shape[1]), np.nan, np.float32)
+    mask = np.zeros(data.shape, dtype=bool)
+    for rows, source, columns in (
+        (big_index.lookup(labels), big_five.data, slice(0, width)),
+        (dark_index.lookup(labels), dark_triad.data, slice(width, None)),
+    ):
+        present = rows >= 0
+        data[present, columns] = source[rows[present]]
+        mask[present, columns] = True
+    names = list(big_five.dimension_names) + list(dark_triad.dimension_names)
+    return JointData(data, mask, labels, names)
+
+
+@instrumented
+def cross_correlation(joint=None, chunk_size=65536):
+    """
+    Pearson correlation of every Big Five facet with every Dark Triad trait.
+
+    Only respondents present in both datasets contribute.
+
+    Returns:
+    - A (35, 4) array, rows in dimension_names order, columns in dark_dimension_names order.
+    """
+    joint = joint if joint is not None else join_datasets(how="inner")
+    width = len(dimension_names)
+    complete = joint.mask.all(axis=1)
+    accumulator = accumulate(joint.data[complete], chunk_size)
+    return accumulator.correlation()[:width, width:]
+
+
+def print_cross_correlation(correlation):
+    """Prints the facet by dark trait correlation table as one block."""
+    print(
+        format_matrix(
+            correlation,
+            dimension_names,
+            "Cross-correlation",
+            column_names=dark_dimension_names,
+        )
+    )
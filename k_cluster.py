@@ -1,31 +1,96 @@
 import numpy as np
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
 import plotly.express as px
 
+from distances import squared_distances
+from instrumentation import instrumented
+from render import write_figure
 
-def kclusterencoding(data, k=4):
+# Rows per block when computing distances, bounds the temporaries to ~chunk_size * k
+DEFAULT_CHUNK_SIZE = 65536
+# Above this many rows the "auto" backend switches to MiniBatchKMeans
+MINIBATCH_THRESHOLD = 100_000
+
+
+@instrumented
+def cluster_distances(data, centers, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Compute the Euclidean distance of every row to every center.
+
+    Works on blocks of rows with distances.squared_distances, so the
+    temporaries stay bounded for memory-mapped data.
+
+    Parameters:
+    - data: A 2D array (or memmap) where each row is a data point.
+    - centers: A 2D array of shape (k, d) with the cluster centers.
+    - chunk_size: The number of rows processed per block.
+
+    Returns:
+    - A 2D numpy array of shape (n, k) with the distances.
+    """
+    centers = np.asarray(centers, dtype=np.float64)
+    center_norms = np.einsum("ij,ij->i", centers, centers)
+    distances = np.empty((len(data), len(centers)))
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start : start + chunk_size], dtype=np.float64)
+        block = distances[start : start + len(chunk)]
+        squared_distances(chunk, centers, center_norms, out=block)
+        np.sqrt(block, out=block)
+    return distances
+
+
+def label_dtype(k):
+    """The smallest unsigned integer dtype that holds the cluster ids of k clusters."""
+    return np.min_scalar_type(max(k - 1, 0))
+
+
+def make_kmeans(k, n_samples, backend="auto", batch_size=4096):
+    """Create the (unfitted) clustering estimator for a backend name."""
+    if backend == "auto":
+        backend = "minibatch" if n_samples >= MINIBATCH_THRESHOLD else "kmeans"
+    if backend == "kmeans":
+        return KMeans(n_clusters=k, random_state=42)
+    if backend == "minibatch":
+        return MiniBatchKMeans(n_clusters=k, random_state=42, batch_size=batch_size)
+    raise ValueError('backend must be "kmeans", "minibatch" or "auto".')
+
+
+@instrumented
+def kclusterencoding(
+    data,
+    k=4,
+    backend="auto",
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    batch_size=4096,
+    scaler=None,
+):
     """
     Find k clusters, return an array of arrays that for each data point have its distance to each cluster.
 
     Parameters:
     - data: A 2D numpy array where each row is a data point.
     - k: The number of clusters to form.
+    - backend: "kmeans", "minibatch" or "auto" (MiniBatchKMeans for large data).
+    - chunk_size: The number of rows per block when computing distances.
+    - batch_size: The batch size of the MiniBatchKMeans backend.
+    - scaler: A fitted scaling.Scaler; clustering runs on one float32 copy of
+      data scaled in place.
 
     Returns:
     - A tuple containing:
       - A 2D numpy array where each row contains the distances of a data point to each cluster center.
       - A 1D numpy array with the index of the closest cluster for each data point.
     """
-    kmeans = KMeans(n_clusters=k, random_state=42)
+    if scaler is not None:
+        data = scaler.transform(data)
+    kmeans = make_kmeans(k, len(data), backend, batch_size)
     kmeans.fit(data)
-    cluster_centers = kmeans.cluster_centers_
-    distances = np.array(
-        [np.linalg.norm(data - center, axis=1) for center in cluster_centers]
-    ).T
-    closest_clusters = np.argmin(distances, axis=1)
-    return distances, closest_clusters
+    distances = cluster_distances(data, kmeans.cluster_centers_, chunk_size)
+    # The fit already assigned every point to its closest center
+    return distances, kmeans.labels_
 
 
+@instrumented
 def clusterencodingdraw(encoding, closest_clusters, names, k=4):
     """
     Embed each point in k-1 dimensional space by using its first k-1 distances as the values and label it by its name.
@@ -50,8 +115,7 @@ def clusterencodingdraw(encoding, closest_clusters, names, k=4):
         color=closest_clusters.astype(str),  # Color by cluster index
         title="3D Cluster Encoding Visualization",
     )
-    fig.write_html("cluster_encoding.html")
-    fig.show()
+    write_figure(fig, "cluster_encoding.html")
 
 
 def perform_encoding_and_draw(data, names, k=4):
@@ -0,0 +1,83 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from sklearn.metrics import davies_bouldin_score, silhouette_score
+
+from instrumentation import instrumented
+from k_cluster import make_kmeans
+from shared_array import SharedArray, init_worker, worker_array
+
+# Silhouette is O(n^2), so above this many rows it is estimated on a sample
+SILHOUETTE_SAMPLE_SIZE = 10_000
+
+
+class KScore(NamedTuple):
+    k: int
+    inertia: float
+    silhouette: float
+    davies_bouldin: float
+
+
+def _score_k(k, backend, silhouette_sample_size):
+    return score_k(worker_array(), k, backend, silhouette_sample_size)
+
+
+def score_k(data, k, backend="auto", silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE):
+    """Fit k clusters and score them by inertia, silhouette and Davies-Bouldin."""
+    kmeans = make_kmeans(k, len(data), backend)
+    labels = kmeans.fit(data).labels_
+    sample_size = silhouette_sample_size if len(data) > silhouette_sample_size else None
+    return KScore(
+        k,
+        float(kmeans.inertia_),
+        float(silhouette_score(data, labels, sample_size=sample_size, random_state=42)),
+        float(davies_bouldin_score(data, labels)),
+    )
+
+
+@instrumented
+def sweep_k(
+    data,
+    ks=range(2, 16),
+    backend="auto",
+    silhouette_sample_size=SILHOUETTE_SAMPLE_SIZE,
+    max_workers=None,
+):
+    """
+    Fit and score every k in ks in parallel to help choose the number of clusters.
+
+    The data matrix is placed in shared memory once and every worker process
+    attaches to it, instead of pickling it into each task.
+
+    Parameters:
+    - data: A 2D numpy array where each row is a data point.
+    - ks: The cluster counts to try.
+    - backend: "kmeans", "minibatch" or "auto", as in kclusterencoding.
+    - silhouette_sample_size: Rows sampled for the silhouette score on large data.
+    - max_workers: The number of worker processes (defaults to the CPU count).
+
+    Returns:
+    - A list of KScore tuples (k, inertia, silhouette, davies_bouldin), one per k.
+    """
+    ks = list(ks)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(ks))
+    with SharedArray(data) as shared:
+        with ProcessPoolExecutor(
+            max_workers, initializer=init_worker, initargs=(shared.spec,)
+        ) as pool:
+            futures = [
+                pool.submit(_score_k, k, backend, silhouette_sample_size) for k in ks
+            ]
+            return [future.result() for future in futures]
+
+
+def print_k_scores(scores):
+    """Prints the sweep results as a table."""
+    print(f"{'k':>3} {'inertia':>14} {'silhouette':>11} {'davies_bouldin':>15}")
+    print(
+        "\n".join(
+            f"{s.k:>3} {s.inertia:>14.2f} {s.silhouette:>11.4f} {s.davies_bouldin:>15.4f}"
+            for s in scores
+        )
+    )
@@ -1,38 +1,94 @@
-from general_data import dimension_names, no_overall_indices, data, labels
-from k_cluster import perform_encoding_and_draw
-from pca_tools import perform_pca_and_plot
+import argparse
 
+import instrumentation
+from general_data import dimension_names, no_overall_indices, load_big_five
+from k_cluster import clusterencodingdraw, kclusterencoding
+from pca_tools import pca_analysis
+from pipeline import Pipeline, standardize
+from plot_pca import plot_pca
+from render import RENDER_MODES, set_render_mode
+from scaling import SCALING_METHODS
 
-def do_pca():
-    perform_pca_and_plot(
-        data,
-        dimension_names,
-        labels,
-        no_overall_indices,
-        2,
-        "Excluding Overall",
-        "no_overall",
-    )
 
-    perform_pca_and_plot(
+def do_pca(pipeline, data, labels, scaler):
+    # One fit with the most components any plot needs, the 2D plot uses the first two
+    pca = pipeline.run(
+        "pca",
+        pca_analysis,
         data,
-        dimension_names,
-        labels,
-        no_overall_indices,
-        3,
-        "Excluding Overall",
-        "no_overall",
+        dimension_names=dimension_names,
+        n_components=3,
+        indices=no_overall_indices,
+        scaler=scaler,
     )
+    transformed_data, _ = pca.value
+
+    for n_components in (2, 3):
+        pipeline.run(
+            "render_pca",
+            plot_pca,
+            cache=False,
+            data=transformed_data[:, :n_components],
+            labels=labels,
+            title=f"{n_components}D PCA of Personality Profiles (Excluding Overall)",
+            filename=f"{n_components}d_pca_no_overall",
+            n_components=n_components,
+        )
 
 
-def do_k_cluster_encoding():
-  # Perform k-cluster encoding and draw the 3D visualization
-  perform_encoding_and_draw(data, labels, k=3)
+def do_k_cluster_encoding(pipeline, data, labels, scaler):
+    # Perform k-cluster encoding and draw the 3D visualization
+    # Clustering runs on all dimensions, overall scores included
+    encoding = pipeline.run("cluster", kclusterencoding, data, k=3, scaler=scaler)
+    distances, closest_clusters = encoding.value
+    pipeline.run(
+        "render_clusters",
+        clusterencodingdraw,
+        cache=False,
+        encoding=distances,
+        closest_clusters=closest_clusters,
+        names=labels,
+        k=3,
+    )
+
 
 def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--render-mode", choices=RENDER_MODES)
+    parser.add_argument("--output-dir")
+    parser.add_argument(
+        "--no-stage-cache",
+        action="store_true",
+        help="Do not reuse or write on-disk stage results (use after changing "
+        "stage code that PIPELINE_CACHE_VERSION does not cover)",
+    )
+    parser.add_argument(
+        "--scaling",
+        choices=SCALING_METHODS,
+        help="Scale features before PCA and clustering (default: raw scores)",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="PATH",
+        help="Record timings of the run and write them to PATH as a Chrome trace",
+    )
+    args = parser.parse_args()
+    set_render_mode(args.render_mode, args.output_dir)
+    if args.profile:
+        instrumentation.enable(output=args.profile)
+
+    pipeline = Pipeline(use_disk=not args.no_stage_cache)
+    store = load_big_five()
+    data = pipeline.source("load", store.data)
+
+    scaler = pipeline.run("standardize", standardize, data, method=args.scaling)
+
     # Perform PCA and plot for each scenario
-    do_pca()
-    do_k_cluster_encoding()
+    do_pca(pipeline, data, store.labels, scaler)
+    do_k_cluster_encoding(pipeline, data, store.labels, scaler)
+
+    if instrumentation.is_enabled():
+        print(instrumentation.summary())
 
 
 if __name__ == "__main__":
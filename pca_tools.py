@@ -1,35 +1,159 @@
-from sklearn.decomposition import PCA
+import numpy as np
+from sklearn.decomposition import PCA, IncrementalPCA
+from instrumentation import instrumented
 from plot_pca import plot_pca
 
 
+PCA_SOLVERS = ("auto", "full", "covariance_eigh", "randomized", "arpack")
+
+
+def iter_row_chunks(data, chunk_size, indices=None, dtype=None, scaler=None):
+    """Yields row blocks of data (e.g. a memmap), selecting the indices columns per block.
+
+    With a fitted ``scaler`` (over the columns of data) each block is scaled
+    in place, so no scaled copy of the whole matrix is made.
+    """
+    for start in range(0, len(data), chunk_size):
+        chunk = data[start : start + chunk_size]
+        if indices is not None:
+            chunk = chunk[:, indices]
+        if scaler is not None:
+            # Column selection already copied the block
+            chunk = scaler.transform(chunk, indices, copy=indices is None)
+        yield chunk if dtype is None else chunk.astype(dtype, copy=False)
+
+
+@instrumented
+def fit_incremental_pca(chunks, n_components=3, pca=None):
+    """Fits an IncrementalPCA from an iterable of row chunks.
+
+    Pass a previously fitted ``pca`` to keep updating its components with new
+    rows instead of refitting. Leading chunks are merged until the first
+    partial fit sees at least ``n_components`` rows.
+    """
+    if pca is None:
+        pca = IncrementalPCA(n_components=n_components)
+    pending, pending_rows = [], 0
+    for chunk in chunks:
+        pending.append(chunk)
+        pending_rows += len(chunk)
+        if not hasattr(pca, "components_") and pending_rows < pca.n_components:
+            continue
+        pca.partial_fit(np.concatenate(pending) if len(pending) > 1 else chunk)
+        pending, pending_rows = [], 0
+    if pending:
+        pca.partial_fit(np.concatenate(pending))
+    return pca
+
+
+def update_pca(pca, new_rows, indices=None):
+    """Updates a fitted IncrementalPCA with newly arrived respondents."""
+    if indices is not None:
+        new_rows = new_rows[:, indices]
+    return fit_incremental_pca([new_rows], pca=pca)
+
+
+@instrumented
 def pca_analysis(
-    data, dimension_names, n_components=3, indices=None, print_components=False
+    data,
+    dimension_names,
+    n_components=3,
+    indices=None,
+    print_components=False,
+    chunk_size=None,
+    solver="auto",
+    dtype=None,
+    scaler=None,
 ):
-    """Performs PCA and sorts components by magnitude."""
+    """Performs PCA and sorts components by magnitude.
+
+    ``solver`` picks the sklearn ``svd_solver``; "randomized" and "covariance_eigh"
+    are much cheaper than "full" when only a few components of many rows are
+    needed. ``dtype`` (e.g. np.float32) sets the precision the whole fit runs in;
+    by default the input dtype is kept.
+
+    With ``chunk_size`` the fit and transform stream over row chunks through an
+    IncrementalPCA, so data larger than RAM (e.g. a memmap) is never copied whole.
+
+    ``scaler`` is a fitted scaling.Scaler over the columns of data; rows are
+    scaled after column selection, in place on the selected float32 copy.
+    """
+    if solver not in PCA_SOLVERS:
+        raise ValueError(f"solver must be one of {PCA_SOLVERS}.")
+
+    if chunk_size is not None:
+        pca = fit_incremental_pca(
+            iter_row_chunks(data, chunk_size, indices, dtype, scaler), n_components
+        )
+        transformed_data = np.empty(
+            (len(data), pca.n_components_), dtype=pca.components_.dtype
+        )
+        start = 0
+        for chunk in iter_row_chunks(data, chunk_size, indices, dtype, scaler):
+            transformed_data[start : start + len(chunk)] = pca.transform(chunk)
+            start += len(chunk)
+    else:
+        if indices is not None:
+            data = data[:, indices]
+        if scaler is not None:
+            data = scaler.transform(data, indices, copy=indices is None)
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        pca = PCA(n_components=n_components, svd_solver=solver, random_state=42)
+        transformed_data = pca.fit_transform(data)
     if indices is not None:
-        data = data[:, indices]
         dimension_names = [dimension_names[i] for i in indices]
 
-    pca = PCA(n_components=n_components)
-    transformed_data = pca.fit_transform(data)
-    sorted_components = []
-    for component in pca.components_:
-        component_dict = {
-            dim_name: dim_value
-            for dim_name, dim_value in zip(dimension_names, component)
-        }
-        sorted_component = dict(
-            sorted(component_dict.items(), key=lambda item: abs(item[1]), reverse=True)
-        )
-        sorted_components.append({k: f"{v:.2f}" for k, v in sorted_component.items()})
+    loadings = PCALoadings(pca.components_, dimension_names)
 
     if print_components:
-        for i, component in enumerate(sorted_components):
-            print(f"Principal Component {i+1}:")
-            for dim, value in component.items():
-                print(f"  {dim}: {value}")
+        print(loadings)
+
+    return transformed_data, loadings
+
+
+class PCALoadings:
+    """Loadings of fitted principal components, ordered by magnitude per component.
+
+    Sorting is a single argsort over the loadings array; values are only
+    formatted to strings when the table is printed.
+    """
+
+    def __init__(self, components, dimension_names):
+        self.loadings = np.asarray(components)
+        self.dimension_names = np.asarray(dimension_names)
+        # Per component, dimension indices by decreasing absolute loading
+        self.order = np.argsort(-np.abs(self.loadings), axis=1, kind="stable")
+
+    def __len__(self):
+        return len(self.loadings)
+
+    def __getitem__(self, component):
+        """Returns ``{dimension: loading}`` for one component, sorted by magnitude."""
+        return dict(self.top(component))
+
+    def top(self, component, k=None):
+        """Returns the k largest-magnitude ``(dimension, loading)`` pairs of a component."""
+        order = self.order[component, :k]
+        return list(
+            zip(
+                self.dimension_names[order].tolist(),
+                self.loadings[component, order].tolist(),
+            )
+        )
+
+    def format(self, k=None, precision=2):
+        """Formats the top k loadings of every component as text."""
+        lines = []
+        for i in range(len(self)):
+            lines.append(f"Principal Component {i+1}:")
+            lines.extend(
+                f"  {dim}: {value:.{precision}f}" for dim, value in self.top(i, k)
+            )
+        return "\n".join(lines)
 
-    return transformed_data, sorted_components
+    def __str__(self):
+        return self.format()
 
 
 def perform_pca_and_plot(
@@ -1,7 +1,22 @@
-from typing import TypedDict, Union
+from array import array
+from collections.abc import Mapping, MutableMapping
+from typing import Iterable, NamedTuple, Optional, TypedDict, Union
 
 import numpy as np
 
+from general_data import dimension_names
+from profile_store import flatten_profile, malformed_traits
+
+# Position of every dimension in a profile row
+DIMENSION_INDEX = {name: i for i, name in enumerate(dimension_names)}
+# Each trait is a block of its overall score followed by its facets
+TRAIT_OFFSETS = {
+    name[: -len("_overall")]: i
+    for i, name in enumerate(dimension_names)
+    if name.endswith("_overall")
+}
+TRAIT_WIDTH = len(dimension_names) // len(TRAIT_OFFSETS)
+
 
 # Define the structure of the profile using TypedDict
 class SubTrait(TypedDict):
@@ -68,83 +83,61 @@ class PersonalityProfileTemplate(TypedDict):
     openness: Trait
 
 
-class PersonalityProfile:
+class PersonalityProfile(Mapping):
+    """A respondent's scores stored as one fixed-length float32 row.
+
+    Values live in an ``array('f')`` in ``dimension_names`` order, so a profile
+    costs ~200 bytes instead of five nested dicts. Dict-style access still works:
+    ``profile["agreeableness"]["sub"]["altruism"]`` reads and writes through to
+    the row, and a single dimension is also available as ``profile["altruism"]``.
+    """
+
+    __slots__ = ("_values",)
+
     def __init__(self, profile: PersonalityProfileTemplate = None):
-        # Initialize the profile with the template structure or a provided profile
-        self.profile: PersonalityProfileTemplate = (
-            profile
-            if profile
-            else {
-                "agreeableness": {
-                    "overall": 0.0,
-                    "sub": {
-                        "altruism": 0.0,
-                        "cooperation": 0.0,
-                        "modesty": 0.0,
-                        "morality": 0.0,
-                        "sympathy": 0.0,
-                        "trust": 0.0,
-                    },
-                },
-                "conscientiousness": {
-                    "overall": 0.0,
-                    "sub": {
-                        "achievement_striving": 0.0,
-                        "cautiousness": 0.0,
-                        "dutifulness": 0.0,
-                        "orderliness": 0.0,
-                        "self_discipline": 0.0,
-                        "self_efficacy": 0.0,
-                    },
-                },
-                "extraversion": {
-                    "overall": 0.0,
-                    "sub": {
-                        "activity_level": 0.0,
-                        "assertiveness": 0.0,
-                        "cheerfulness": 0.0,
-                        "excitement_seeking": 0.0,
-                        "friendliness": 0.0,
-                        "gregariousness": 0.0,
-                    },
-                },
-                "neuroticism": {
-                    "overall": 0.0,
-                    "sub": {
-                        "anger": 0.0,
-                        "anxiety": 0.0,
-                        "depression": 0.0,
-                        "immoderation": 0.0,
-                        "self_consciousness": 0.0,
-                        "vulnerability": 0.0,
-                    },
-                },
-                "openness": {
-                    "overall": 0.0,
-                    "sub": {
-                        "adventurousness": 0.0,
-                        "artistic_interests": 0.0,
-                        "emotionality": 0.0,
-                        "imagination": 0.0,
-                        "intellect": 0.0,
-                        "liberalism": 0.0,
-                    },
-                },
-            }
-        )
+        # Initialize the profile with zeros or with the values of a provided profile
+        self._values = array("f", bytes(4 * len(dimension_names)))
+        if profile:
+            for name, value in flatten_profile(profile):
+                self._values[_dimension_position(name)] = value
+
+    @property
+    def profile(self) -> PersonalityProfileTemplate:
+        """The profile as a nested mapping; writes go through to the row."""
+        return self
+
+    def __getitem__(self, key: str):
+        if key in TRAIT_OFFSETS:
+            return _TraitView(self._values, TRAIT_OFFSETS[key])
+        return self._values[DIMENSION_INDEX[key]]
+
+    def __setitem__(self, key: str, value: float) -> None:
+        self._values[DIMENSION_INDEX[key]] = value
+
+    def __iter__(self):
+        return iter(TRAIT_OFFSETS)
+
+    def __len__(self) -> int:
+        return len(TRAIT_OFFSETS)
 
     def validate_and_update_profile(
         self, new_profile: PersonalityProfileTemplate
     ) -> None:
         """Validate and update the entire profile."""
         for trait, values in new_profile.items():
+            if trait not in TRAIT_OFFSETS:
+                raise ValueError(f"Unknown trait '{trait}'.")
+            view = self[trait]
             # Validate overall score
             overall_value = values.get("overall")
-            self.profile[trait]["overall"] = self.validate_value(overall_value)
+            view["overall"] = self.validate_value(overall_value)
 
             # Validate sub-traits
+            sub_view = view["sub"]
             for sub_trait, sub_value in values.get("sub", {}).items():
-                self.profile[trait]["sub"][sub_trait] = self.validate_value(sub_value)
+                if sub_trait not in sub_view:
+                    raise ValueError(f"Unknown sub-trait '{sub_trait}' of '{trait}'.")
+                sub_view[sub_trait] = self.validate_value(sub_value)
 
     def validate_value(self, value: Union[int, float]) -> float:
         """Ensure the value is between 0 and 1, or convert positive integers by dividing by 100."""
@@ -159,22 +152,223 @@ class PersonalityProfile:
 
     def extract(self) -> list:
         """Convert the profile to a list for PCA analysis."""
-        features = []
-        for trait, values in self.profile.items():
-            features.append(values["overall"])
-            features.extend(values["sub"].values())
-        return features
+        return self._values.tolist()
 
     def to_np_array(self) -> np.array:
-        """Convert the profile to a numpy array for PCA analysis."""
-        return np.array(self.extract())
+        """View the profile as a numpy array for PCA analysis (shares memory, no copy)."""
+        return np.frombuffer(self._values, dtype=np.float32)
 
     def overall_to_np_array(self) -> np.array:
-        """Convert the overall scores of the profile to a numpy array for PCA analysis."""
-        return np.array([trait["overall"] for trait in self.profile.values()])
+        """View the overall scores of the profile as a numpy array for PCA analysis."""
+        return self.to_np_array()[::TRAIT_WIDTH]
 
     def excluding_overall_to_np_array(self) -> np.array:
-        """Convert the profile to a numpy array excluding overall scores for PCA analysis."""
-        return np.array(
-            [trait["sub"].values() for trait in self.profile.values()]
-        ).flatten()
+        """Convert the profile to a numpy array excluding overall scores for PCA analysis.
+
+        The facet scores are not contiguous in the row, so this one is a copy.
+        """
+        return self.to_np_array().reshape(-1, TRAIT_WIDTH)[:, 1:].ravel()
+
+
+class _TraitView(MutableMapping):
+    """``{"overall": ..., "sub": {...}}`` view of one trait block of a profile row."""
+
+    __slots__ = ("_values", "_offset")
+
+    def __init__(self, values: array, offset: int):
+        self._values = values
+        self._offset = offset
+
+    def __getitem__(self, key: str):
+        if key == "overall":
+            return self._values[self._offset]
+        if key == "sub":
+            return _SubTraitView(self._values, self._offset)
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value) -> None:
+        if key == "overall":
+            self._values[self._offset] = value
+        elif key == "sub":
+            sub_view = _SubTraitView(self._values, self._offset)
+            for sub_trait, sub_value in value.items():
+                sub_view[sub_trait] = sub_value
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Profile entries cannot be removed.")
+
+    def __iter__(self):
+        return iter(("overall", "sub"))
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return repr({"overall": self["overall"], "sub": dict(self["sub"])})
+
+
+class _SubTraitView(MutableMapping):
+    """``{sub_trait: value}`` view of the facet scores of one trait block."""
+
+    __slots__ = ("_values", "_offset")
+
+    def __init__(self, values: array, offset: int):
+        self._values = values
+        self._offset = offset
+
+    def _position(self, key: str) -> int:
+        position = DIMENSION_INDEX.get(key)
+        if position is None or not 0 < position - self._offset < TRAIT_WIDTH:
+            raise KeyError(key)
+        return position
+
+    def __getitem__(self, key: str) -> float:
+        return self._values[self._position(key)]
+
+    def __setitem__(self, key: str, value: float) -> None:
+        self._values[self._position(key)] = value
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError("Profile entries cannot be removed.")
+
+    def __iter__(self):
+        names = dimension_names[self._offset + 1 : self._offset + TRAIT_WIDTH]
+        return iter(names)
+
+    def __len__(self) -> int:
+        return TRAIT_WIDTH - 1
+
+    def __repr__(self) -> str:
+        return repr(dict(self))
+
+
+def _dimension_position(name: str) -> int:
+    try:
+        return DIMENSION_INDEX[name]
+    except KeyError:
+        raise ValueError(f"Unknown dimension '{name}'.") from None
+
+
+# Reason codes reported by validate_batch
+VALID = 0
+NOT_A_NUMBER = 1
+NEGATIVE_INTEGER = 2
+FLOAT_OUT_OF_RANGE = 3
+MISSING_OVERALL = 4
+UNKNOWN_DIMENSION = 5
+NOT_A_MAPPING = 6
+
+REASON_MESSAGES = {
+    NOT_A_NUMBER: "not a number",
+    NEGATIVE_INTEGER: "negative integer",
+    FLOAT_OUT_OF_RANGE: "float outside (0, 1]",
+    MISSING_OVERALL: "missing overall score",
+    UNKNOWN_DIMENSION: "unknown dimension",
+    NOT_A_MAPPING: "not a mapping",
+}
+
+
+def invalid_cells(cell_reasons, names=dimension_names):
+    """``name (reason)`` descriptions of the failing cells of one validated row."""
+    return [
+        f"{names[column]} ({REASON_MESSAGES[code]})"
+        for column, code in enumerate(cell_reasons)
+        if code
+    ]
+
+
+class BatchValidation(NamedTuple):
+    values: np.ndarray
+    errors: np.ndarray
+    reasons: np.ndarray
+    cell_reasons: np.ndarray
+
+
+def validate_batch(
+    matrix_or_records: Union[np.ndarray, Iterable[PersonalityProfileTemplate]],
+    integer_mask: Optional[np.ndarray] = None,
+    missing: Optional[np.ndarray] = None,
+) -> BatchValidation:
+    """Apply the validate_value rules to a whole batch of profiles at once.
+
+    Accepts an ``(n, len(dimension_names))`` matrix or an iterable of nested/flat
+    profile dicts. Floats in (0, 1] are scaled by 100 and rounded, non-negative
+    integers pass through, and NaN or infinite values are NOT_A_NUMBER.
+    ``integer_mask`` marks the cells whose source value was an integer; it is
+    inferred for records and integer matrices, and for float matrices finite
+    integral values outside (0, 1] count as integer scores. ``missing`` marks
+    the matrix cells of absent overall scores; it is inferred for records.
+
+    Returns a BatchValidation with the clean float32 matrix (invalid cells set
+    to 0), a per-row error mask, the first reason code of every row and the
+    reason code of every cell.
+    """
+    row_reasons = None
+    if isinstance(matrix_or_records, np.ndarray):
+        values = np.array(matrix_or_records, dtype=np.float64)
+        if integer_mask is None:
+            if np.issubdtype(matrix_or_records.dtype, np.integer):
+                integer_mask = np.ones(values.shape, dtype=bool)
+            else:
+                # inf equals its own floor, so finiteness is checked explicitly
+                integer_mask = (
+                    np.isfinite(values)
+                    & (values == np.floor(values))
+                    & ~((values > 0) & (values <= 1))
+                )
+        if missing is None:
+            missing = np.zeros(values.shape, dtype=bool)
+    else:
+        values, integer_mask, missing, row_reasons = _records_to_matrix(
+            matrix_or_records
+        )
+    integer_mask = np.asarray(integer_mask, dtype=bool)
+    missing = np.asarray(missing, dtype=bool)
+
+    valid_float = ~integer_mask & (values > 0) & (values <= 1)
+    cell_reasons = np.zeros(values.shape, dtype=np.uint8)
+    cell_reasons[~integer_mask & ~valid_float] = FLOAT_OUT_OF_RANGE
+    cell_reasons[integer_mask & (values < 0)] = NEGATIVE_INTEGER
+    cell_reasons[~np.isfinite(values)] = NOT_A_NUMBER
+    cell_reasons[missing] = MISSING_OVERALL
+
+    # values is a private float64 copy here, so scale and round it in place
+    np.multiply(values, 100, out=values, where=valid_float)
+    np.round(values, out=values)
+    clean = values.astype(np.float32)
+    clean[cell_reasons != VALID] = 0
+
+    # First failing cell of every row, reported as the row's reason
+    rows = np.arange(len(values))
+    reasons = cell_reasons[rows, (cell_reasons != VALID).argmax(axis=1)]
+    if row_reasons is not None:
+        reasons = np.where(row_reasons != VALID, row_reasons, reasons)
+    return BatchValidation(clean, reasons != VALID, reasons, cell_reasons)
+
+
+def _records_to_matrix(records):
+    """Lay profile dicts out as value, integer and missing matrices."""
+    records = list(records)
+    shape = (len(records), len(dimension_names))
+    values = np.zeros(shape)
+    integer_mask = np.ones(shape, dtype=bool)
+    missing = np.zeros(shape, dtype=bool)
+    row_reasons = np.zeros(len(records), dtype=np.uint8)
+    for row, record in enumerate(records):
+        if malformed_traits(record):
+            row_reasons[row] = NOT_A_MAPPING
+            continue
+        for name, value in flatten_profile(record, missing_overall=None):
+            column = DIMENSION_INDEX.get(name)
+            if column is None:
+                row_reasons[row] = UNKNOWN_DIMENSION
+            elif value is None:
+                missing[row, column] = True
+            elif isinstance(value, bool) or not isinstance(value, (int, float)):
+                values[row, column] = np.nan
+            else:
+                values[row, column] = value
+                integer_mask[row, column] = isinstance(value, int)
+    return values, integer_mask, missing, row_reasons
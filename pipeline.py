@@ -0,0 +1,151 @@
+import hashlib
+import os
+import pickle
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from instrumentation import span
+from scaling import Scaler
+
+# Bump when stage functions or the classes of their results change in ways
+# the stage keys cannot see; old results are then recomputed
+PIPELINE_CACHE_VERSION = 1
+
+PIPELINE_CACHE_DIR = os.environ.get(
+    "PERSONALITY_PIPELINE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".pipeline_cache"),
+)
+
+
+class StageResult(NamedTuple):
+    key: str
+    value: Any
+
+
+def data_key(array):
+    """Identity of a source array: its cache file for memmaps, else a hash of its bytes."""
+    digest = hashlib.sha256(f"{array.shape}|{array.dtype.str}|".encode())
+    filename = getattr(array, "filename", None)
+    if filename:
+        # Profile cache files are named by a content hash of their source
+        digest.update(os.path.basename(filename).encode())
+    else:
+        digest.update(np.ascontiguousarray(array).data)
+    return digest.hexdigest()[:32]
+
+
+def _stage_key(name, function, inputs, params, version=0):
+    digest = hashlib.sha256(
+        f"v{PIPELINE_CACHE_VERSION}.{version}|{name}|"
+        f"{function.__module__}.{function.__qualname__}".encode()
+    )
+    for stage_input in inputs:
+        digest.update(f"|{stage_input.key}".encode())
+    params = {name: _param_token(value) for name, value in params.items()}
+    digest.update(repr(sorted(params.items())).encode())
+    return digest.hexdigest()[:32]
+
+
+def _param_token(value):
+    """What identifies a stage param in its key."""
+    # Stage results passed as params are identified by their key, not their value
+    if isinstance(value, StageResult):
+        return f"<stage {value.key}>"
+    # The repr of a large array elides its middle, so arrays are hashed whole
+    if isinstance(value, np.ndarray):
+        return f"<array {data_key(value)}>"
+    return value
+
+
+_MISSING = object()
+
+
+def _load_result(name, path):
+    """Unpickle a stored stage result, or return _MISSING if it no longer loads."""
+    try:
+        with span(f"stage {name}", source="disk"), open(path, "rb") as handle:
+            return pickle.load(handle)
+    except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        # Written by code whose classes have since changed
+        return _MISSING
+
+
+class Pipeline:
+    """Runs analysis stages and memoizes their outputs in memory and on disk.
+
+    Each stage is keyed by its name, function, parameters and the keys of the
+    stages it consumes, so a stage only recomputes when something upstream of
+    it changed. Code changes are not detected: bump PIPELINE_CACHE_VERSION (or
+    a stage's ``version``) when a stage function changes, or run main.py with
+    --no-stage-cache to bypass the on-disk results.
+    """
+
+    def __init__(self, cache_dir=PIPELINE_CACHE_DIR, use_disk=True):
+        self.cache_dir = cache_dir
+        self.use_disk = use_disk
+        self._memory = {}
+
+    def source(self, name, array, key=None):
+        """Wrap input data as a stage result so later stages can depend on it."""
+        return StageResult(key or f"{name}-{data_key(array)}", array)
+
+    def run(
+        self, name, function, *inputs, cache=True, persist=True, version=0, **params
+    ):
+        """
+        Run ``function`` on the values of ``inputs`` (StageResults) plus ``params``.
+
+        A StageResult may also be passed as a param; the function receives its
+        value and the stage depends on its key like on an input.
+
+        Stages with side effects, such as rendering, pass ``cache=False`` and
+        always run; their params are then not hashed. Cheap stages with large
+        outputs pass ``persist=False`` to be memoized in memory only. Bump
+        ``version`` to invalidate the stored results of one stage.
+        """
+        arguments = {
+            param: value.value if isinstance(value, StageResult) else value
+            for param, value in params.items()
+        }
+        if not cache:
+            with span(f"stage {name}", source="computed"):
+                value = function(
+                    *(stage_input.value for stage_input in inputs), **arguments
+                )
+            return StageResult(None, value)
+
+        key = _stage_key(name, function, inputs, params, version)
+        if key in self._memory:
+            return StageResult(key, self._memory[key])
+
+        path = os.path.join(self.cache_dir, f"{name}-{key}.pkl")
+        persist = persist and self.use_disk
+        value = _MISSING
+        if persist and os.path.exists(path):
+            value = _load_result(name, path)
+        if value is _MISSING:
+            with span(f"stage {name}", source="computed"):
+                value = function(
+                    *(stage_input.value for stage_input in inputs), **arguments
+                )
+            if persist:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                temporary = f"{path}.{os.getpid()}.tmp"
+                with open(temporary, "wb") as handle:
+                    pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporary, path)
+        self._memory[key] = value
+        return StageResult(key, value)
+
+
+def standardize(data, method=None):
+    """Stage: fit the feature scaler used by PCA and clustering.
+
+    Returns a scaling.Scaler for "zscore", "minmax" or "robust", or None to
+    leave the features raw. Scaling is applied by the consuming stages, block
+    by block, so no scaled copy of the matrix is cached.
+    """
+    if method is None:
+        return None
+    return Scaler.fit(data, method)
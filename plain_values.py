@@ -1,8 +1,16 @@
-from general_data import dark_dimension_names, dark_data, dark_labels
+from general_data import dark_dimension_names, load_dark_triad
 import plotly.express as px
-import numpy as np
+from correlation import (
+    correlation_matrix,
+    covariance_matrix,
+    format_matrix,
+    write_matrix,
+)
+from instrumentation import instrumented
+from render import write_figure
 
 
+@instrumented
 def plot_top_variance_components(data, labels, dimension_names, title, filename, dim=3):
     """Plots the first 'dim' components of each point in data.
     Gives 3d interactive plot and a snapshot of the plot is saved as a png file.
@@ -29,35 +37,34 @@ def plot_top_variance_components(data, labels, dimension_names, title, filename,
     )
 
     # Save the figure as an HTML file
-    fig.write_html(filename)
-    fig.show()
+    write_figure(fig, filename)
 
 
-def print_covariance_matrix(data, dimension_names):
-    """Prints the covariance matrix of the data."""
-    covariance_matrix = np.cov(data.T)
-    print("Covariance matrix:")
-    print("  " + "  ".join(dimension_names))
-    for i, row in enumerate(covariance_matrix):
-        print(dimension_names[i], end=" ")
-        for value in row:
-            print(f"{value:.2f}", end=" ")
-        print("")
+@instrumented
+def print_covariance_matrix(data, dimension_names, path=None, max_workers=1):
+    """Prints the covariance matrix of the data, or writes it to a .csv/.npy path."""
+    covariance = covariance_matrix(data, max_workers=max_workers)
+    if path is not None:
+        write_matrix(covariance, dimension_names, path)
+    else:
+        print(format_matrix(covariance, dimension_names, "Covariance matrix"))
 
 
-def print_correlation_matrix(data, dimension_names):
-    """Prints the correlation matrix of the data."""
-    correlation_matrix = np.corrcoef(data.T)
-    print("Correlation matrix:")
-    print("  " + "  ".join(dimension_names))
-    for i, row in enumerate(correlation_matrix):
-        print(dimension_names[i], end=" ")
-        for value in row:
-            print(f"{value:.2f}", end=" ")
-        print("")
-    
+@instrumented
+def print_correlation_matrix(
+    data, dimension_names, method="pearson", path=None, max_workers=1
+):
+    """Prints the correlation matrix of the data, or writes it to a .csv/.npy path."""
+    correlation = correlation_matrix(data, method, max_workers=max_workers)
+    if path is not None:
+        write_matrix(correlation, dimension_names, path)
+    else:
+        print(format_matrix(correlation, dimension_names, "Correlation matrix"))
+
 
 def main():
+    dark_store = load_dark_triad()
+    dark_data, dark_labels = dark_store.data, dark_store.labels
     # Ensure the filename has the correct extension
     output_filename = "dark_triad.html"
     # Plot the top 3 variance components
@@ -1,66 +1,111 @@
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import to_rgba
 import plotly.graph_objects as go
 
-
-def plot_pca(data, labels, title, filename, n_components=3):
+from instrumentation import instrumented
+from render import save_matplotlib, write_figure
+
+# Above this many points the 3D plot shows labels on hover only
+LABEL_THRESHOLD = 1000
+# Above this many points the 3D plot draws a fixed random sample
+MAX_3D_POINTS = 50_000
+# Above this many points the 2D plot becomes a hexbin density plot
+DENSITY_THRESHOLD = 20_000
+# Number of labels drawn on the 2D plot, for the points farthest from the origin
+N_LABELS_2D = 100
+
+
+@instrumented
+def plot_pca(
+    data,
+    labels,
+    title,
+    filename,
+    n_components=3,
+    label_threshold=LABEL_THRESHOLD,
+    max_points=MAX_3D_POINTS,
+    n_labels=N_LABELS_2D,
+    density_threshold=DENSITY_THRESHOLD,
+):
     """Plots PCA results in 2D or 3D based on the number of components with enhanced depth perception."""
 
     if n_components not in [2, 3]:
         raise ValueError("n_components must be 2 or 3 for plotting.")
 
-    plt.figure(figsize=(8, 6) if n_components == 2 else (10, 8))
-
-    # Calculate distances from the origin
-    distances = np.linalg.norm(data, axis=1)
-    # Normalize distances to range [0, 1]
-    normalized_distances = (distances - distances.min()) / (
-        distances.max() - distances.min()
-    )
-
     if n_components == 2:
-        for i, label in enumerate(labels):
-            plt.scatter(data[i, 0], data[i, 1], alpha=normalized_distances[i])
-            plt.text(data[i, 0], data[i, 1], label, fontsize=9, ha="right")
+        # Calculate distances from the origin
+        distances = np.linalg.norm(data[:, :2], axis=1)
+        # Normalize distances to range [0, 1], all points opaque if they are equal
+        spread = distances.max() - distances.min() if len(distances) else 0
+        if spread > 0:
+            normalized_distances = (distances - distances.min()) / spread
+        else:
+            normalized_distances = np.ones_like(distances)
+
+        plt.figure(figsize=(8, 6))
+        if len(data) > density_threshold:
+            plt.hexbin(data[:, 0], data[:, 1], gridsize=80, bins="log", cmap="viridis")
+            plt.colorbar(label="Respondents")
+        else:
+            # One scatter call with a per-point alpha channel
+            colors = np.tile(to_rgba("C0"), (len(data), 1))
+            colors[:, 3] = normalized_distances
+            plt.scatter(data[:, 0], data[:, 1], c=colors)
+        # Only label the most extreme points
+        labelled = np.argsort(distances)[::-1][:n_labels]
+        for i in labelled:
+            plt.text(data[i, 0], data[i, 1], labels[i], fontsize=9, ha="right")
         plt.xlabel("Principal Component 1")
         plt.ylabel("Principal Component 2")
         plt.title(title)
-        plt.savefig(f"{filename}.png")
-        plt.close()
+        save_matplotlib(f"{filename}.png")
     elif n_components == 3:
         # Create a Plotly 3D scatter plot
         fig = go.Figure()
 
-        # Define colors for each octant
-        octant_colors = {
-            (1, 1, 1): "red",
-            (1, 1, -1): "green",
-            (1, -1, 1): "blue",
-            (1, -1, -1): "cyan",
-            (-1, 1, 1): "magenta",
-            (-1, 1, -1): "yellow",
-            (-1, -1, 1): "orange",
-            (-1, -1, -1): "purple",
-        }
-
-        for i, label in enumerate(labels):
-            # Determine the octant
-            octant = (np.sign(data[i, 0]), np.sign(data[i, 1]), np.sign(data[i, 2]))
-            color = octant_colors[octant]
-
-            # Set a constant size for all points
-            size = 10  # Constant size for all points
-
-            # Add the main point
+        # Color per octant, indexed by the sign bits of (x, y, z), negative = 1
+        octant_colors = [
+            "red",  # (+, +, +)
+            "green",  # (+, +, -)
+            "blue",  # (+, -, +)
+            "cyan",  # (+, -, -)
+            "magenta",  # (-, +, +)
+            "yellow",  # (-, +, -)
+            "orange",  # (-, -, +)
+            "purple",  # (-, -, -)
+        ]
+
+        labels = np.asarray(labels)
+        shown = np.arange(len(data))
+        if len(shown) > max_points:
+            # Decimate to a fixed random sample so the HTML stays bounded
+            rng = np.random.default_rng(42)
+            shown = np.sort(rng.choice(len(data), max_points, replace=False))
+        octants = (
+            (data[shown, 0] < 0).astype(np.intp) << 2
+            | (data[shown, 1] < 0).astype(np.intp) << 1
+            | (data[shown, 2] < 0).astype(np.intp)
+        )
+        # Past label_threshold points, labels only appear on hover
+        mode = "markers+text" if len(shown) <= label_threshold else "markers"
+
+        # One trace per octant instead of one per point
+        for octant, color in enumerate(octant_colors):
+            points = shown[octants == octant]
+            if len(points) == 0:
+                continue
             fig.add_trace(
                 go.Scatter3d(
-                    x=[data[i, 0]],
-                    y=[data[i, 1]],
-                    z=[data[i, 2]],
-                    mode="markers+text",
-                    marker=dict(size=size, color=color, opacity=0.8),
-                    text=[label],
+                    x=data[points, 0],
+                    y=data[points, 1],
+                    z=data[points, 2],
+                    mode=mode,
+                    marker=dict(size=10, color=color, opacity=0.8),
+                    text=labels[points],
+                    hoverinfo="text" if mode == "markers" else None,
                     textposition="top center",
+                    name=color,
                 )
             )
 
@@ -128,8 +173,7 @@ def plot_pca(data, labels, title, filename, n_components=3):
         )
 
         # Save as an interactive HTML file
-        fig.write_html(f"{filename}.html")
-        fig.show()
+        write_figure(fig, f"{filename}.html")
 
 
 # Example usage:
@@ -0,0 +1,87 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+
+from instrumentation import instrumented
+from profile_store import ProfileStore
+
+# Bump when the on-disk layout or the way stores are built changes
+CACHE_VERSION = 1
+
+CACHE_DIR = os.environ.get(
+    "PERSONALITY_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".profile_cache"),
+)
+
+
+def source_key(paths, dimension_names, dtype=np.float32, block_size=1 << 20):
+    """Content hash of the source files plus everything that shapes the matrix."""
+    digest = hashlib.sha256()
+    digest.update(f"v{CACHE_VERSION}|{np.dtype(dtype).str}|".encode())
+    digest.update("|".join(dimension_names).encode())
+    for path in paths:
+        digest.update(b"\0")
+        with open(path, "rb") as handle:
+            for block in iter(lambda: handle.read(block_size), b""):
+                digest.update(block)
+    return digest.hexdigest()[:32]
+
+
+def _entry_paths(name, key, cache_dir):
+    prefix = os.path.join(cache_dir, f"{name}-{key}")
+    return f"{prefix}.data.npy", f"{prefix}.labels.npy"
+
+
+def sidecar_path(array, suffix):
+    """Path of a file stored with the cache entry an array is mapped from, or None.
+
+    Sidecar files (e.g. derived statistics) share the entry's content hash, so
+    they are dropped together with it when the source changes.
+    """
+    filename = getattr(array, "filename", None)
+    if not filename or not filename.endswith(".data.npy"):
+        return None
+    return f"{filename[: -len('.data.npy')]}.{suffix}"
+
+
+def load(name, key, dimension_names, cache_dir=None):
+    """Open a cached store memory-mapped read-only, or return None on a miss."""
+    data_path, labels_path = _entry_paths(name, key, cache_dir or CACHE_DIR)
+    if not (os.path.exists(data_path) and os.path.exists(labels_path)):
+        return None
+    matrix = np.load(data_path, mmap_mode="r")
+    labels = np.load(labels_path, mmap_mode="r")
+    return ProfileStore.from_arrays(matrix, labels, dimension_names)
+
+
+def save(name, key, store, cache_dir=None):
+    """Write a store to the cache and drop older entries for the same dataset."""
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    for stale in glob.glob(os.path.join(cache_dir, f"{name}-*")):
+        os.remove(stale)
+    labels = np.asarray(store.labels, dtype=str)
+    for path, array in zip(_entry_paths(name, key, cache_dir), (store.data, labels)):
+        # Write under a temporary name so readers never see a partial file
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            np.save(handle, array)
+        os.replace(temporary, path)
+
+
+@instrumented
+def cached_store(name, paths, dimension_names, build, cache_dir=None):
+    """Return the cached store for ``paths``, building and caching it on a miss.
+
+    The cache key is a content hash of the source files, so editing a source
+    invalidates its entry automatically. Hits are memory-mapped and skip parsing.
+    """
+    key = source_key(paths, dimension_names)
+    store = load(name, key, dimension_names, cache_dir)
+    if store is None:
+        store = build()
+        save(name, key, store, cache_dir)
+        store = load(name, key, dimension_names, cache_dir)
+    return store
@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+from instrumentation import instrumented
+from personality_profile import invalid_cells, validate_batch
+from profile_store import ProfileStore, flatten_profile
+
+DEFAULT_CHUNK_SIZE = 10_000
+
+
+class IngestError(NamedTuple):
+    line: int
+    message: str
+
+
+class Chunk(NamedTuple):
+    lines: np.ndarray
+    labels: list
+    values: np.ndarray
+    integer_mask: np.ndarray
+    errors: list
+
+
+def iter_jsonl_chunks(path, dimension_names, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Parse a JSONL export into fixed-size chunks of raw values.
+
+    Each line is an object with a ``label`` and either a ``profile`` entry or the
+    profile keys inline, nested like PersonalityProfileTemplate or flat by
+    dimension name. Missing dimensions default to 0.
+    """
+    column_index = {name: i for i, name in enumerate(dimension_names)}
+    buffer = _ChunkBuffer(len(dimension_names), chunk_size)
+    with open(path, encoding="utf-8") as handle:
+        for line_number, line in enumerate(handle, start=1):
+            if not line.strip():
+                continue
+            row = buffer.next_row(line_number)
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("Line is not a JSON object.")
+                label = record.pop("label")
+                for name, value in flatten_profile(record.get("profile", record)):
+                    column = column_index[name]
+                    if isinstance(value, bool) or not isinstance(value, (int, float)):
+                        raise ValueError(f"Non-numeric value for '{name}'.")
+                    buffer.values[row, column] = value
+                    buffer.integer_mask[row, column] = isinstance(value, int)
+            except KeyError as error:
+                buffer.reject(row, f"Missing or unknown key {error}.")
+            except (ValueError, AttributeError, OverflowError, TypeError) as error:
+                buffer.reject(row, str(error))
+            else:
+                buffer.labels.append(label)
+            if buffer.full:
+                yield buffer.flush()
+    if buffer.size:
+        yield buffer.flush()
+
+
+def iter_csv_chunks(
+    path, dimension_names, chunk_size=DEFAULT_CHUNK_SIZE, label_column="label"
+):
+    """Parse a CSV export with a label column and one column per dimension into chunks."""
+    column_index = {name: i for i, name in enumerate(dimension_names)}
+    with open(path, newline="", encoding="utf-8") as handle:
+        reader = csv.reader(handle)
+        header = next(reader)
+        if label_column not in header:
+            raise ValueError(f"CSV header has no '{label_column}' column.")
+        unknown = [
+            name for name in header if name != label_column and name not in column_index
+        ]
+        if unknown:
+            raise ValueError(f"Unknown dimensions in CSV header: {unknown}.")
+        label_position = header.index(label_column)
+        value_positions = [i for i, name in enumerate(header) if name != label_column]
+        columns = [column_index[header[i]] for i in value_positions]
+
+        lines, rows, errors = [], [], []
+        for record in reader:
+            if not record:
+                continue
+            if len(record) != len(header):
+                errors.append(
+                    IngestError(
+                        reader.line_num,
+                        f"Expected {len(header)} fields, got {len(record)}.",
+                    )
+                )
+                continue
+            lines.append(reader.line_num)
+            rows.append(record)
+            if len(rows) == chunk_size:
+                yield _csv_chunk(
+                    lines,
+                    rows,
+                    errors,
+                    label_position,
+                    value_positions,
+                    columns,
+                    len(dimension_names),
+                )
+                lines, rows, errors = [], [], []
+        if rows or errors:
+            yield _csv_chunk(
+                lines,
+                rows,
+                errors,
+                label_position,
+                value_positions,
+                columns,
+                len(dimension_names),
+            )
+
+
+def _csv_chunk(lines, rows, errors, label_position, value_positions, columns, width):
+    """Convert a block of CSV string rows into a Chunk with vectorized parsing."""
+    values = np.zeros((len(rows), width))
+    integer_mask = np.ones((len(rows), width), dtype=bool)
+    if rows:
+        cells = np.array(rows, dtype=str)
+        labels = cells[:, label_position].tolist()
+        cells = np.char.strip(cells[:, value_positions])
+        cells[cells == ""] = "0"
+        values[:, columns] = _parse_floats(cells)
+        # A signed integer is still an integer, so negatives get the integer reason
+        integer_mask[:, columns] = np.char.isdigit(np.char.lstrip(cells, "+-"))
+    else:
+        labels = []
+    return Chunk(np.array(lines), labels, values, integer_mask, errors)
+
+
+def _parse_floats(cells):
+    """Parse a string array into floats, turning unparsable cells into NaN."""
+    try:
+        return cells.astype(np.float64)
+    except ValueError:
+        return np.vectorize(_parse_float, otypes=[np.float64])(cells)
+
+
+def _parse_float(cell):
+    try:
+        return float(cell)
+    except ValueError:
+        return np.nan
+
+
+class _ChunkBuffer:
+    """Reusable per-chunk buffers for record-oriented parsers."""
+
+    def __init__(self, width, chunk_size):
+        self.values = np.zeros((chunk_size, width))
+        self.integer_mask = np.ones((chunk_size, width), dtype=bool)
+        self.lines = np.zeros(chunk_size, dtype=np.int64)
+        self.rejected = np.zeros(chunk_size, dtype=bool)
+        self.labels = []
+        self.errors = []
+        self.size = 0
+
+    @property
+    def full(self):
+        return self.size == len(self.values)
+
+    def next_row(self, line_number):
+        row = self.size
+        self.lines[row] = line_number
+        self.size += 1
+        return row
+
+    def reject(self, row, message):
+        self.rejected[row] = True
+        self.errors.append(IngestError(int(self.lines[row]), message))
+
+    def flush(self):
+        keep = ~self.rejected[: self.size]
+        chunk = Chunk(
+            self.lines[: self.size][keep],
+            self.labels,
+            self.values[: self.size][keep],
+            self.integer_mask[: self.size][keep],
+            self.errors,
+        )
+        self.values[:] = 0
+        self.integer_mask[:] = True
+        self.rejected[:] = False
+        self.labels, self.errors, self.size = [], [], 0
+        return chunk
+
+
+def count_lines(path, block_size=1 << 20):
+    """Count newline-terminated lines without decoding the file."""
+    count = 0
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(block_size), b""):
+            count += block.count(b"\n")
+    return count
+
+
+@instrumented
+def ingest(
+    path, dimension_names, store=None, chunk_size=DEFAULT_CHUNK_SIZE, file_format=None
+):
+    """Stream a JSONL or CSV export into a ProfileStore.
+
+    Records are parsed and validated chunk by chunk, so apart from the store
+    itself memory stays bounded by ``chunk_size``. Invalid rows are skipped and
+    returned as a list of IngestError with their line numbers.
+
+    Returns:
+    - A tuple of (store, errors).
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip(".").lower()
+    if file_format in ("jsonl", "ndjson", "json"):
+        chunks = iter_jsonl_chunks(path, dimension_names, chunk_size)
+    elif file_format == "csv":
+        chunks = iter_csv_chunks(path, dimension_names, chunk_size)
+    else:
+        raise ValueError(f"Unsupported profile format '{file_format}'.")
+
+    if store is None:
+        store = ProfileStore(dimension_names)
+    store.reserve(len(store) + count_lines(path) + 1)
+
+    errors = []
+    for chunk in chunks:
+        errors.extend(chunk.errors)
+        validation = validate_batch(chunk.values, chunk.integer_mask)
+        bad_rows = validation.errors
+        for row in np.flatnonzero(bad_rows):
+            columns = invalid_cells(validation.cell_reasons[row], dimension_names)
+            errors.append(
+                IngestError(
+                    int(chunk.lines[row]), f"Invalid values: {', '.join(columns)}."
+                )
+            )
+        labels = [label for label, bad in zip(chunk.labels, bad_rows) if not bad]
+        store.extend(labels, validation.values[~bad_rows])
+    errors.sort()
+    return store, errors
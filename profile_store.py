@@ -0,0 +1,135 @@
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+from instrumentation import instrumented
+
+
+class ProfileStore:
+    """Columnar store of respondent profiles backed by one preallocated matrix.
+
+    Rows are written straight into a ``(capacity, len(dimension_names))`` matrix
+    in ``dimension_names`` order, so no per-profile lists or arrays are built.
+    """
+
+    def __init__(self, dimension_names, capacity=0, dtype=np.float32):
+        self.dimension_names = list(dimension_names)
+        self.column_index = {name: i for i, name in enumerate(self.dimension_names)}
+        self._matrix = np.zeros((capacity, len(self.dimension_names)), dtype=dtype)
+        self._labels = np.empty(capacity, dtype=object)
+        self._size = 0
+
+    @classmethod
+    @instrumented
+    def from_profiles(cls, profiles, dimension_names, dtype=np.float32):
+        """Build a store from a ``{label: profile}`` mapping."""
+        store = cls(dimension_names, capacity=len(profiles), dtype=dtype)
+        for label, profile in profiles.items():
+            store.add(label, profile)
+        return store
+
+    @classmethod
+    def from_arrays(cls, matrix, labels, dimension_names):
+        """Wrap an existing matrix (e.g. a read-only memmap) without copying it."""
+        if matrix.shape != (len(labels), len(dimension_names)):
+            raise ValueError(
+                f"Matrix of shape {matrix.shape} does not match "
+                f"{len(labels)} labels and {len(dimension_names)} dimensions."
+            )
+        store = cls(dimension_names, dtype=matrix.dtype)
+        store._matrix, store._labels, store._size = matrix, labels, len(labels)
+        return store
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def data(self):
+        """View of the filled rows of the profile matrix."""
+        return self._matrix[: self._size]
+
+    @property
+    def labels(self):
+        """View of the interned labels of the filled rows."""
+        return self._labels[: self._size]
+
+    def reserve(self, capacity):
+        """Grow the underlying buffers so they hold at least ``capacity`` rows."""
+        if capacity <= len(self._matrix):
+            return
+        matrix = np.zeros((capacity, self._matrix.shape[1]), dtype=self._matrix.dtype)
+        matrix[: self._size] = self._matrix[: self._size]
+        labels = np.empty(capacity, dtype=object)
+        labels[: self._size] = self._labels[: self._size]
+        self._matrix, self._labels = matrix, labels
+
+    def _next_rows(self, count):
+        """Return the slice for the next ``count`` rows, growing geometrically if needed."""
+        end = self._size + count
+        if end > len(self._matrix):
+            self.reserve(max(end, 2 * len(self._matrix)))
+        rows = slice(self._size, end)
+        self._size = end
+        return rows
+
+    def add(self, label, profile):
+        """Write a nested profile (or a flat ``{dimension: value}`` dict) as a new row."""
+        row = self._next_rows(1).start
+        target = self._matrix[row]
+        for name, value in flatten_profile(profile):
+            try:
+                target[self.column_index[name]] = value
+            except KeyError:
+                self._size -= 1
+                target[:] = 0
+                raise ValueError(f"Unknown dimension '{name}'.") from None
+        self._labels[row] = sys.intern(str(label))
+
+    def extend(self, labels, rows):
+        """Append a block of already-ordered rows and their labels."""
+        rows = np.asarray(rows)
+        if rows.ndim != 2 or rows.shape[1] != self._matrix.shape[1]:
+            raise ValueError(
+                f"Expected rows of shape (n, {self._matrix.shape[1]}), got {rows.shape}."
+            )
+        if len(labels) != len(rows):
+            raise ValueError("labels and rows must have the same length.")
+        target = self._next_rows(len(rows))
+        self._matrix[target] = rows
+        self._labels[target] = [sys.intern(str(label)) for label in labels]
+
+    def columns(self, indices):
+        """Select columns, returning a view whenever ``indices`` is evenly spaced."""
+        indices = list(indices)
+        if len(indices) > 1:
+            step = indices[1] - indices[0]
+            if step > 0 and indices == list(range(indices[0], indices[-1] + 1, step)):
+                return self.data[:, indices[0] : indices[-1] + 1 : step]
+        return self.data[:, indices]
+
+    def blocks(self, width):
+        """View the matrix as ``(n, n_blocks, width)``, e.g. one block per trait."""
+        return self.data.reshape(self._size, -1, width)
+
+
+def flatten_profile(profile, missing_overall=0):
+    """Yield ``(dimension_name, value)`` pairs of a nested or flat profile.
+
+    A nested trait without an ``overall`` entry yields ``missing_overall``.
+    """
+    for key, value in profile.items():
+        if isinstance(value, Mapping):
+            yield f"{key}_overall", value.get("overall", missing_overall)
+            yield from value.get("sub", {}).items()
+        else:
+            yield key, value
+
+
+def malformed_traits(profile):
+    """Keys of the nested traits of a profile whose ``sub`` entry is not a mapping."""
+    return [
+        key
+        for key, value in profile.items()
+        if isinstance(value, Mapping) and not isinstance(value.get("sub", {}), Mapping)
+    ]
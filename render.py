@@ -0,0 +1,107 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib.pyplot as plt
+from plotly.offline import get_plotlyjs
+
+from instrumentation import instrumented
+
+# interactive: write files and open the figure, headless: only write files,
+# none: build figures but write and show nothing
+RENDER_MODES = ("interactive", "headless", "none")
+
+_settings = {"mode": "interactive", "output_dir": "."}
+
+
+def set_render_mode(mode=None, output_dir=None):
+    """Set the render mode and/or the directory plot files are written to."""
+    if mode is not None:
+        if mode not in RENDER_MODES:
+            raise ValueError(f"Render mode must be one of {RENDER_MODES}.")
+        _settings["mode"] = mode
+    if output_dir is not None:
+        _settings["output_dir"] = output_dir
+
+
+# The environment goes through the same validation as explicit settings
+set_render_mode(
+    os.environ.get("PERSONALITY_RENDER_MODE"), os.environ.get("PERSONALITY_OUTPUT_DIR")
+)
+
+
+def get_render_mode():
+    return _settings["mode"]
+
+
+def output_path(filename):
+    """Path of an output file inside the configured output directory."""
+    os.makedirs(_settings["output_dir"], exist_ok=True)
+    return os.path.join(_settings["output_dir"], filename)
+
+
+@instrumented
+def write_figure(fig, filename):
+    """Write a Plotly figure to HTML and show it when running interactively.
+
+    In headless mode all HTML files share one plotly.min.js in the output
+    directory instead of each embedding the ~3.5MB bundle.
+    """
+    mode = get_render_mode()
+    if mode == "none":
+        return None
+    path = output_path(filename)
+    fig.write_html(path, include_plotlyjs="directory" if mode == "headless" else True)
+    if mode == "interactive":
+        fig.show()
+    return path
+
+
+@instrumented
+def save_matplotlib(filename):
+    """Save and close the current matplotlib figure."""
+    path = None
+    if get_render_mode() != "none":
+        path = output_path(filename)
+        plt.savefig(path)
+    plt.close()
+    return path
+
+
+def _init_worker(mode, output_dir):
+    set_render_mode(mode, output_dir)
+
+
+def _run_job(job):
+    function, args, kwargs = job
+    return function(*args, **kwargs)
+
+
+@instrumented
+def render_batch(jobs, max_workers=None, mode="headless", output_dir=None):
+    """
+    Render many figures in parallel worker processes.
+
+    Parameters:
+    - jobs: An iterable of (function, args, kwargs) tuples, e.g. (plot_pca, (...), {}).
+      Functions and arguments must be picklable.
+    - max_workers: The number of worker processes (defaults to the CPU count).
+    - mode: The render mode used inside the workers, "headless" or "none".
+    - output_dir: The output directory (defaults to the current setting).
+
+    Returns:
+    - A list with the return value of every job, in order.
+    """
+    if mode == "interactive":
+        raise ValueError("Batch rendering cannot run in interactive mode.")
+    output_dir = output_dir or _settings["output_dir"]
+    if mode == "headless":
+        # Write the shared bundle up front so workers never race to create it
+        os.makedirs(output_dir, exist_ok=True)
+        bundle = os.path.join(output_dir, "plotly.min.js")
+        if not os.path.exists(bundle):
+            with open(bundle, "w", encoding="utf-8") as handle:
+                handle.write(get_plotlyjs())
+    with ProcessPoolExecutor(
+        max_workers, initializer=_init_worker, initargs=(mode, output_dir)
+    ) as pool:
+        return list(pool.map(_run_job, jobs))
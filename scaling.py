@@ -0,0 +1,177 @@
+import os
+from typing import NamedTuple
+
+import numpy as np
+
+import profile_cache
+from correlation import MomentAccumulator
+from instrumentation import instrumented
+
+SCALING_METHODS = ("zscore", "minmax", "robust")
+DEFAULT_CHUNK_SIZE = 65536
+# Rows kept to estimate the medians and quartiles of the robust scaler;
+# below this many rows they are exact
+RESERVOIR_SIZE = 100_000
+
+
+class ScalingStatistics(NamedTuple):
+    count: int
+    mean: np.ndarray
+    std: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    median: np.ndarray
+    iqr: np.ndarray
+
+
+@instrumented
+def compute_statistics(
+    data, chunk_size=DEFAULT_CHUNK_SIZE, sample_size=RESERVOIR_SIZE, seed=42
+):
+    """
+    Per-column statistics of every scaling method in one pass over row chunks.
+
+    Means and variances are merged per chunk (Chan et al.), extremes are running,
+    and medians/quartiles come from a uniform reservoir sample of ``sample_size``
+    rows, so data larger than RAM (e.g. a memmap) is read exactly once.
+    """
+    n_features = data.shape[1]
+    moments = MomentAccumulator(n_features, diagonal=True)
+    minimum = np.full(n_features, np.inf)
+    maximum = np.full(n_features, -np.inf)
+    rng = np.random.default_rng(seed)
+    sample = np.empty((0, n_features), dtype=np.float32)
+    keys = np.empty(0)
+    for start in range(0, len(data), chunk_size):
+        chunk = np.asarray(data[start : start + chunk_size], dtype=np.float64)
+        moments.update(chunk)
+        np.minimum(minimum, chunk.min(axis=0), out=minimum)
+        np.maximum(maximum, chunk.max(axis=0), out=maximum)
+
+        # Keeping the rows with the smallest random keys is a uniform sample
+        sample = np.concatenate([sample, chunk.astype(np.float32)])
+        keys = np.concatenate([keys, rng.random(len(chunk))])
+        if len(keys) > sample_size:
+            keep = np.argpartition(keys, sample_size - 1)[:sample_size]
+            sample, keys = sample[keep], keys[keep]
+
+    count = moments.count
+    std = np.sqrt(moments.comoment / max(count - 1, 1))
+    lower, median, upper = np.percentile(sample, [25, 50, 75], axis=0)
+    return ScalingStatistics(
+        count, moments.mean, std, minimum, maximum, median, upper - lower
+    )
+
+
+def cached_statistics(
+    data, chunk_size=DEFAULT_CHUNK_SIZE, sample_size=RESERVOIR_SIZE, seed=42
+):
+    """Statistics of a matrix, stored next to its profile cache entry when it has one."""
+    path = profile_cache.sidecar_path(data, "scaling.npz")
+    if path is not None and os.path.exists(path):
+        with np.load(path) as saved:
+            if (
+                tuple(saved["shape"]) == data.shape
+                and int(saved["sample_size"]) == sample_size
+                and int(saved["seed"]) == seed
+            ):
+                return ScalingStatistics(
+                    int(saved["count"]),
+                    *(saved[name] for name in ScalingStatistics._fields[1:]),
+                )
+    statistics = compute_statistics(data, chunk_size, sample_size, seed)
+    if path is not None:
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, "wb") as handle:
+            np.savez(
+                handle,
+                shape=data.shape,
+                sample_size=sample_size,
+                seed=seed,
+                **statistics._asdict(),
+            )
+        os.replace(temporary, path)
+    return statistics
+
+
+class Scaler:
+    """Per-column scaling ``(x - center) / scale`` applied in place on float32 blocks.
+
+    "zscore" uses the mean and standard deviation, "minmax" maps the observed
+    range to [0, 1] and "robust" uses the median and interquartile range.
+    Constant columns keep a scale of 1.
+    """
+
+    def __init__(self, method, center, scale):
+        if method not in SCALING_METHODS:
+            raise ValueError(f"method must be one of {SCALING_METHODS}.")
+        self.method = method
+        self.center = np.asarray(center, dtype=np.float32)
+        scale = np.asarray(scale, dtype=np.float32)
+        self.scale = np.where(scale > 0, scale, 1).astype(np.float32)
+        self._inverse_scale = 1 / self.scale
+
+    @classmethod
+    def from_statistics(cls, statistics, method="zscore"):
+        if method == "zscore":
+            return cls(method, statistics.mean, statistics.std)
+        if method == "minmax":
+            return cls(
+                method, statistics.minimum, statistics.maximum - statistics.minimum
+            )
+        if method == "robust":
+            return cls(method, statistics.median, statistics.iqr)
+        raise ValueError(f"method must be one of {SCALING_METHODS}.")
+
+    @classmethod
+    def fit(cls, data, method="zscore", chunk_size=DEFAULT_CHUNK_SIZE, use_cache=True):
+        """
+        Fit a scaler in one streaming pass over data.
+
+        With ``use_cache`` the statistics of a profile cache matrix (e.g.
+        ``general_data.data``) are saved with its cache entry and reused, so
+        refitting on unchanged data reads nothing.
+        """
+        if method not in SCALING_METHODS:
+            raise ValueError(f"method must be one of {SCALING_METHODS}.")
+        if use_cache:
+            statistics = cached_statistics(data, chunk_size)
+        else:
+            statistics = compute_statistics(data, chunk_size)
+        return cls.from_statistics(statistics, method)
+
+    def transform(self, data, columns=None, copy=True):
+        """
+        Scale rows of data, restricted to the scaler columns in ``columns`` if given.
+
+        With ``copy=False`` a writable float32 array is scaled in place and
+        returned; otherwise one float32 copy is made and scaled in place.
+        """
+        center, inverse_scale = self.center, self._inverse_scale
+        if columns is not None:
+            center, inverse_scale = center[columns], inverse_scale[columns]
+        if copy or data.dtype != np.float32 or not data.flags.writeable:
+            data = np.array(data, dtype=np.float32)
+        data -= center
+        data *= inverse_scale
+        return data
+
+    def inverse_transform(self, data, columns=None):
+        """Map scaled rows back to the original units, as a new float32 array."""
+        center, scale = self.center, self.scale
+        if columns is not None:
+            center, scale = center[columns], scale[columns]
+        data = np.array(data, dtype=np.float32)
+        data *= scale
+        data += center
+        return data
+
+    def save(self, path):
+        """Save the scaler to an .npz file."""
+        np.savez(path, method=self.method, center=self.center, scale=self.scale)
+
+    @classmethod
+    def load(cls, path):
+        """Load a scaler saved with ``save``."""
+        with np.load(path) as saved:
+            return cls(str(saved["method"]), saved["center"], saved["scale"])
@@ -0,0 +1,474 @@
+"""Local HTTP service answering "which cluster and PCA coordinates is this profile in".
+
+Usage: python service.py [--host 127.0.0.1] [--port 8765] [--model model.npz]
+
+POST /assign with a PersonalityProfileTemplate-shaped JSON object (or a
+``{"profiles": [...]}`` list of them) returns the cluster, the distance to
+every center and the PCA coordinates. Concurrent requests are micro-batched
+into one ClusterModel.assign_batch call. GET /metrics serves latency and
+batch size histograms in the Prometheus text format; GET /health answers ok.
+Invalid values get a 400 whose ``invalid`` list has the validate_batch reason
+code of every rejected cell.
+
+Only the standard library and numpy are used at request time.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+from http import HTTPStatus
+
+import numpy as np
+
+from cluster_model import ClusterModel
+from personality_profile import (
+    NOT_A_MAPPING,
+    REASON_MESSAGES,
+    UNKNOWN_DIMENSION,
+    invalid_cells,
+    validate_batch,
+)
+from profile_store import flatten_profile, malformed_traits
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+MAX_BODY_SIZE = 1 << 20
+# (method, path) of every route; other requests share one metrics label
+ROUTES = {("POST", "/assign"), ("GET", "/metrics"), ("GET", "/health")}
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus style."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        position = 0
+        while position < len(self.buckets) and value > self.buckets[position]:
+            position += 1
+        self.counts[position] += 1
+        self.count += 1
+        self.sum += value
+
+    def format(self, name, labels=""):
+        separator = "," if labels else ""
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ("+Inf",), self.counts):
+            cumulative += count
+            lines.append(
+                f'{name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}'
+            )
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class Metrics:
+    def __init__(self):
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.responses = defaultdict(int)
+
+    def format(self):
+        lines = [
+            "# TYPE profile_service_request_seconds histogram",
+        ]
+        for (method, path), histogram in sorted(self.latency.items()):
+            lines.extend(
+                histogram.format(
+                    "profile_service_request_seconds",
+                    f'method="{method}",path="{path}"',
+                )
+            )
+        lines.append("# TYPE profile_service_batch_size histogram")
+        lines.extend(self.batch_size.format("profile_service_batch_size"))
+        lines.append("# TYPE profile_service_responses_total counter")
+        for status, count in sorted(self.responses.items()):
+            lines.append(
+                f'profile_service_responses_total{{status="{status}"}} {count}'
+            )
+        return "\n".join(lines) + "\n"
+
+
+class RequestError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class Batcher:
+    """Collects rows from concurrent requests and assigns them in one call.
+
+    A batch is flushed when it reaches ``max_batch_size`` rows or
+    ``max_delay`` seconds after its first row arrived.
+    """
+
+    def __init__(self, model, metrics, max_batch_size=256, max_delay=0.002):
+        self.model = model
+        self.metrics = metrics
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def assign(self, rows):
+        """Assign a (n, d) block of rows, batched with other pending requests."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((rows, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_delay
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            self._flush(pending)
+
+    def _flush(self, pending):
+        self.metrics.batch_size.observe(sum(len(rows) for rows, _ in pending))
+        try:
+            assignment = self.model.assign_batch(
+                np.concatenate([rows for rows, _ in pending])
+            )
+        except Exception as error:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            return
+        start = 0
+        for rows, future in pending:
+            stop = start + len(rows)
+            if not future.done():
+                future.set_result(
+                    (
+                        assignment.clusters[start:stop],
+                        assignment.distances[start:stop],
+                        assignment.coordinates[start:stop],
+                    )
+                )
+            start = stop
+
+
+def invalid_detail(position, dimension, code):
+    """One entry of the ``invalid`` list of a 400 response."""
+    return {
+        "profile": position,
+        "dimension": dimension,
+        "reason": code,
+        "message": REASON_MESSAGES[code],
+    }
+
+
+def profile_row(model, profile, position=0):
+    """
+    Unvalidated full model row of a template-shaped profile.
+
+    Malformed traits, missing or unknown dimensions are rejected here;
+    non-numeric values become NaN and absent overall scores are marked
+    missing, so that profile_rows reports them with the other invalid values.
+
+    Returns:
+    - A tuple of (row, integer mask, missing mask) for validate_batch.
+    """
+    if not isinstance(profile, dict):
+        raise RequestError(HTTPStatus.BAD_REQUEST, "A profile must be a JSON object.")
+    malformed = malformed_traits(profile)
+    if malformed:
+        raise RequestError(
+            HTTPStatus.BAD_REQUEST,
+            f"'sub' of {', '.join(map(repr, malformed))} must be a JSON object.",
+            [invalid_detail(position, trait, NOT_A_MAPPING) for trait in malformed],
+        )
+    row = np.zeros(len(model.dimension_names))
+    integer_mask = np.ones(len(model.dimension_names), dtype=bool)
+    missing = np.zeros(len(model.dimension_names), dtype=bool)
+    seen = np.zeros(len(model.dimension_names), dtype=bool)
+    for name, value in flatten_profile(profile, missing_overall=None):
+        column = model.column_index.get(name)
+        if column is None:
+            raise RequestError(
+                HTTPStatus.BAD_REQUEST,
+                f"Unknown dimension '{name}'.",
+                [invalid_detail(position, name, UNKNOWN_DIMENSION)],
+            )
+        seen[column] = True
+        if value is None:
+            missing[column] = True
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            value = np.nan
+        row[column] = value
+        integer_mask[column] = isinstance(value, int)
+    if not seen.all():
+        absent = ", ".join(np.asarray(model.dimension_names)[~seen])
+        raise RequestError(HTTPStatus.BAD_REQUEST, f"Missing dimensions: {absent}.")
+    return row, integer_mask, missing
+
+
+def profile_rows(model, profiles):
+    """
+    Validated model rows of template-shaped profiles.
+
+    Values follow the PersonalityProfile rules via validate_batch: floats in
+    (0, 1] are scaled to scores, and negative, non-finite or missing values
+    reject the request with the reason code of every invalid cell.
+    """
+    rows, integer_masks, missing = zip(
+        *(profile_row(model, profile, i) for i, profile in enumerate(profiles))
+    )
+    validation = validate_batch(
+        np.stack(rows), np.stack(integer_masks), np.stack(missing)
+    )
+    if validation.errors.any():
+        invalid = validation.cell_reasons != 0
+        details = [
+            invalid_detail(int(row), model.dimension_names[column], code)
+            for (row, column), code in zip(
+                np.argwhere(invalid), validation.cell_reasons[invalid].tolist()
+            )
+        ]
+        first = int(np.argmax(validation.errors))
+        cells = invalid_cells(validation.cell_reasons[first], model.dimension_names)
+        raise RequestError(
+            HTTPStatus.BAD_REQUEST,
+            f"Invalid values in profile {first}: {', '.join(cells)}.",
+            details,
+        )
+    return validation.values
+
+
+class ProfileService:
+    def __init__(self, model, max_batch_size=256, max_delay=0.002):
+        self.model = model
+        self.metrics = Metrics()
+        self.batcher = Batcher(model, self.metrics, max_batch_size, max_delay)
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=8765):
+        """Start listening; port 0 picks a free port (see ``port``)."""
+        self.batcher.start()
+        self.server = await asyncio.start_server(self._handle_connection, host, port)
+        return self.server
+
+    @property
+    def port(self):
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+        await self.batcher.stop()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await reader.readline()
+                except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+                    break
+                if not request_line.strip():
+                    break
+                keep_alive = await self._handle_request(request_line, reader, writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_request(self, request_line, reader, writer):
+        start = time.perf_counter()
+        method, path, version = "?", "?", "HTTP/1.1"
+        keep_alive = False
+        try:
+            try:
+                method, path, version = request_line.decode("latin-1").split()
+            except ValueError:
+                raise RequestError(
+                    HTTPStatus.BAD_REQUEST, "Malformed request line."
+                ) from None
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" or (
+                version == "HTTP/1.1" and connection != "close"
+            )
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if length < 0:
+                # The body cannot be framed, so neither can the next request
+                keep_alive = False
+                raise RequestError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+            if length > MAX_BODY_SIZE:
+                keep_alive = False
+                raise RequestError(
+                    HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "Body is too large."
+                )
+            body = await reader.readexactly(length) if length else b""
+            status, content_type, payload = await self._route(method, path, body)
+        except RequestError as error:
+            status, content_type = error.status, "application/json"
+            response = {"error": str(error)}
+            if error.details is not None:
+                response["invalid"] = error.details
+            payload = json.dumps(response).encode()
+        except asyncio.IncompleteReadError:
+            return False
+        except Exception as error:
+            status, content_type = HTTPStatus.INTERNAL_SERVER_ERROR, "application/json"
+            payload = json.dumps({"error": str(error)}).encode()
+
+        writer.write(
+            (
+                f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(payload)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+            ).encode("latin-1")
+            + payload
+        )
+        self.metrics.responses[status.value] += 1
+        route = (method, path.split("?", 1)[0])
+        if route not in ROUTES:
+            route = ("unknown", "unknown")
+        self.metrics.latency[route].observe(time.perf_counter() - start)
+        return keep_alive
+
+    async def _route(self, method, path, body):
+        path = path.split("?", 1)[0]
+        if path == "/assign":
+            if method != "POST":
+                raise RequestError(HTTPStatus.METHOD_NOT_ALLOWED, "Use POST.")
+            return HTTPStatus.OK, "application/json", await self._assign(body)
+        if path == "/metrics" and method == "GET":
+            return (
+                HTTPStatus.OK,
+                "text/plain; version=0.0.4",
+                self.metrics.format().encode(),
+            )
+        if path == "/health" and method == "GET":
+            return HTTPStatus.OK, "application/json", b'{"status": "ok"}'
+        raise RequestError(HTTPStatus.NOT_FOUND, f"No route for {method} {path}.")
+
+    async def _assign(self, body):
+        try:
+            document = json.loads(body)
+        except (ValueError, UnicodeDecodeError):
+            raise RequestError(HTTPStatus.BAD_REQUEST, "Body is not JSON.") from None
+        many = isinstance(document, dict) and "profiles" in document
+        profiles = document["profiles"] if many else [document]
+        if not isinstance(profiles, list) or not profiles:
+            raise RequestError(
+                HTTPStatus.BAD_REQUEST, "profiles must be a non-empty list."
+            )
+        rows = profile_rows(self.model, profiles)
+        clusters, distances, coordinates = await self.batcher.assign(rows)
+        results = [
+            {
+                "cluster": int(cluster),
+                "distances": distance.tolist(),
+                "coordinates": coordinate.tolist(),
+            }
+            for cluster, distance, coordinate in zip(clusters, distances, coordinates)
+        ]
+        return json.dumps({"results": results} if many else results[0]).encode()
+
+
+def load_model(path=None, k=3, n_components=3, exclude_overall=False):
+    """Load a saved ClusterModel, or fit one on the general_data matrix."""
+    if path is not None:
+        return ClusterModel.load(path)
+    from general_data import dimension_names, load_big_five, no_overall_indices
+
+    return ClusterModel.fit(
+        load_big_five().data,
+        dimension_names,
+        indices=no_overall_indices if exclude_overall else None,
+        k=k,
+        n_components=n_components,
+    )
+
+
+async def serve(model, host, port, max_batch_size, max_delay):
+    service = ProfileService(model, max_batch_size, max_delay)
+    server = await service.start(host, port)
+    print(f"Serving on http://{host}:{service.port}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--model", help="ClusterModel .npz (default: fit at startup)")
+    parser.add_argument("--save-model", help="Write the fitted model to this .npz path")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--components", type=int, default=3)
+    parser.add_argument(
+        "--exclude-overall",
+        action="store_true",
+        help="Fit on the facet scores only",
+    )
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--max-delay-ms", type=float, default=2.0)
+    args = parser.parse_args()
+
+    model = load_model(args.model, args.k, args.components, args.exclude_overall)
+    if args.save_model:
+        model.save(args.save_model)
+    try:
+        asyncio.run(
+            serve(
+                model,
+                args.host,
+                args.port,
+                args.max_batch_size,
+                args.max_delay_ms / 1000,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+from threadpoolctl import threadpool_limits
+
+
+class SharedArray:
+    """A copy of a numpy array in shared memory that worker processes attach to by name.
+
+    Use as a context manager in the parent process; pass ``spec`` to the workers
+    and call ``attach(spec)`` there to get a zero-copy view of the same buffer.
+    """
+
+    def __init__(self, array):
+        array = np.asarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self.array = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)
+        self.array[...] = array
+        self.spec = (self._shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self.array = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def attach(spec):
+    """Attach to a SharedArray created in another process.
+
+    Returns the SharedMemory handle (keep it alive while the array is in use)
+    and the array view.
+    """
+    name, shape, dtype = spec
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+# Per-worker state, set once by init_worker
+_worker_shms = []
+_worker_arrays = []
+
+
+def init_worker(*specs):
+    """Process pool initializer that attaches the worker to SharedArray specs.
+
+    The arrays are then available through ``worker_array`` for the lifetime of
+    the worker process.
+    """
+    global _worker_shms, _worker_arrays
+    attached = [attach(spec) for spec in specs]
+    _worker_shms = [shm for shm, _ in attached]
+    _worker_arrays = [array for _, array in attached]
+    # One BLAS/OpenMP thread per worker, the pool provides the parallelism
+    threadpool_limits(1)
+
+
+def worker_array(position=0):
+    """The array of the ``position``-th spec passed to init_worker in this worker."""
+    return _worker_arrays[position]
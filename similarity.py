@@ -0,0 +1,300 @@
+import json
+import os
+
+import numpy as np
+
+from distances import squared_distances
+from instrumentation import instrumented
+from personality_profile import (
+    REASON_MESSAGES,
+    PersonalityProfile,
+    invalid_cells,
+    validate_batch,
+)
+
+DEFAULT_BLOCK_SIZE = 65536
+
+
+def _top_k(squared, k):
+    """Column positions and values of the k smallest entries of every row, sorted."""
+    k = min(k, squared.shape[1])
+    nearest = np.argpartition(squared, k - 1, axis=1)[:, :k]
+    values = np.take_along_axis(squared, nearest, axis=1)
+    order = np.argsort(values, axis=1, kind="stable")
+    return np.take_along_axis(nearest, order, axis=1), np.take_along_axis(
+        values, order, axis=1
+    )
+
+
+def project(rows, indices=None, components=None, mean=None):
+    """Map full profile rows into an index space: column selection, then PCA axes."""
+    rows = np.asarray(rows, dtype=np.float32)
+    if rows.ndim == 1:
+        rows = rows[None, :]
+    if indices is not None:
+        rows = rows[:, indices]
+    if components is not None:
+        rows = (rows - mean) @ components.T
+    return np.ascontiguousarray(rows, dtype=np.float32)
+
+
+def _project_blocks(data, indices, components, mean):
+    """Project a (possibly memory-mapped) matrix block by block."""
+    return np.concatenate(
+        [
+            project(data[start : start + DEFAULT_BLOCK_SIZE], indices, components, mean)
+            for start in range(0, len(data), DEFAULT_BLOCK_SIZE)
+        ]
+    )
+
+
+class _ProfileIndex:
+    """Shared query front end: maps profiles into the indexed space.
+
+    The indexed space is the full profile row restricted to ``indices`` and,
+    when ``components``/``mean`` are given, projected onto those PCA axes.
+    """
+
+    def __init__(self, labels, indices=None, components=None, mean=None):
+        self.labels = labels
+        self.indices = None if indices is None else np.asarray(indices, dtype=np.intp)
+        self.components = None if components is None else np.asarray(components)
+        self.mean = None if mean is None else np.asarray(mean)
+
+    def transform(self, rows):
+        """Map full profile rows into the indexed space."""
+        return project(rows, self.indices, self.components, self.mean)
+
+    def query(self, profile, k=10):
+        """
+        Find the k respondents most similar to one profile.
+
+        Parameters:
+        - profile: A PersonalityProfile, a nested/flat profile dict or a full row.
+        - k: The number of neighbours to return.
+
+        Returns:
+        - A tuple of (labels, float32 distances), nearest first. An IVFIndex
+          may return fewer than k when the probed groups hold fewer rows.
+
+        Raises:
+        - ValueError: A profile dict fails validate_batch.
+        """
+        if isinstance(profile, dict):
+            validation = validate_batch([profile])
+            if validation.errors[0]:
+                cells = invalid_cells(validation.cell_reasons[0]) or [
+                    REASON_MESSAGES[int(validation.reasons[0])]
+                ]
+                raise ValueError(f"Invalid values: {', '.join(cells)}.")
+            profile = validation.values[0]
+        if isinstance(profile, PersonalityProfile):
+            profile = profile.to_np_array()
+        labels, distances = self.query_batch(profile, k)
+        # Drop the empty slots of an approximate search with too few candidates
+        found = np.isfinite(distances[0])
+        return labels[0][found], distances[0][found]
+
+    @instrumented
+    def query_batch(self, rows, k=10):
+        """Find the k nearest respondents of every full profile row, as (labels, distances).
+
+        Distances are float32, the precision of the indexed vectors, for every index.
+
+        Slots without a neighbour (IVFIndex with too few candidates) hold an
+        empty label and an infinite distance.
+        """
+        positions, squared = self._search(self.transform(rows), k)
+        labels = np.asarray(self.labels)[positions]
+        labels[positions < 0] = ""
+        return labels, np.sqrt(squared.astype(np.float32, copy=False))
+
+    def _metadata(self):
+        return {"kind": type(self).__name__}
+
+    def _save_arrays(self, directory, arrays):
+        os.makedirs(directory, exist_ok=True)
+        arrays = dict(arrays, labels=np.asarray(self.labels, dtype=str))
+        for name in ("indices", "components", "mean"):
+            if getattr(self, name) is not None:
+                arrays[name] = getattr(self, name)
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        with open(os.path.join(directory, "index.json"), "w", encoding="utf-8") as f:
+            json.dump(dict(self._metadata(), arrays=sorted(arrays)), f)
+
+
+class ExactIndex(_ProfileIndex):
+    """Exact nearest neighbours by blocked brute force over the whole matrix."""
+
+    def __init__(self, vectors, labels, block_size=DEFAULT_BLOCK_SIZE, **space):
+        super().__init__(labels, **space)
+        self.vectors = vectors
+        self.vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+        self.block_size = block_size
+
+    @classmethod
+    @instrumented
+    def build(cls, data, labels, indices=None, components=None, mean=None):
+        """Index the rows of a full profile matrix (e.g. general_data.data)."""
+        vectors = _project_blocks(data, indices, components, mean)
+        return cls(vectors, labels, indices=indices, components=components, mean=mean)
+
+    def _search(self, queries, k):
+        best_positions, best_squared = None, None
+        for start in range(0, len(self.vectors), self.block_size):
+            stop = start + self.block_size
+            squared = squared_distances(
+                queries, self.vectors[start:stop], self.vector_norms[start:stop]
+            )
+            positions, values = _top_k(squared, k)
+            positions += start
+            if best_positions is not None:
+                positions = np.concatenate([best_positions, positions], axis=1)
+                values = np.concatenate([best_squared, values], axis=1)
+                keep, values = _top_k(values, k)
+                positions = np.take_along_axis(positions, keep, axis=1)
+            best_positions, best_squared = positions, values
+        return best_positions, best_squared
+
+    def save(self, directory):
+        self._save_arrays(directory, {"vectors": self.vectors})
+
+
+class IVFIndex(_ProfileIndex):
+    """Approximate nearest neighbours with an inverted-file (IVF) index.
+
+    Rows are grouped under k-means centroids and stored contiguously per
+    group; a query scans only the ``n_probe`` groups closest to it.
+    """
+
+    def __init__(self, vectors, labels, centroids, offsets, n_probe=8, **space):
+        super().__init__(labels, **space)
+        self.vectors = vectors
+        self.vector_norms = np.einsum("ij,ij->i", vectors, vectors)
+        self.centroids = centroids
+        self.centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+        self.offsets = offsets
+        self.n_probe = n_probe
+
+    @classmethod
+    @instrumented
+    def build(
+        cls,
+        data,
+        labels,
+        indices=None,
+        components=None,
+        mean=None,
+        n_lists=None,
+        n_probe=8,
+        training_size=100_000,
+    ):
+        """
+        Index the rows of a full profile matrix (e.g. general_data.data).
+
+        Parameters:
+        - n_lists: The number of groups (defaults to about sqrt(n)).
+        - n_probe: The number of groups scanned per query, trading speed for recall.
+        - training_size: The number of rows sampled to fit the centroids.
+        """
+        from sklearn.cluster import MiniBatchKMeans
+
+        vectors = _project_blocks(data, indices, components, mean)
+        n_lists = n_lists or max(1, int(np.sqrt(len(vectors))))
+        rng = np.random.default_rng(42)
+        sample = vectors
+        if len(vectors) > training_size:
+            sample = vectors[rng.choice(len(vectors), training_size, replace=False)]
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_lists, random_state=42, batch_size=4096, n_init=1
+        ).fit(sample)
+        centroids = kmeans.cluster_centers_.astype(np.float32)
+
+        assignments = np.concatenate(
+            [
+                _top_k(
+                    squared_distances(
+                        vectors[start : start + DEFAULT_BLOCK_SIZE],
+                        centroids,
+                        np.einsum("ij,ij->i", centroids, centroids),
+                    ),
+                    1,
+                )[0][:, 0]
+                for start in range(0, len(vectors), DEFAULT_BLOCK_SIZE)
+            ]
+        )
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        return cls(
+            vectors[order],
+            np.asarray(labels)[order],
+            centroids,
+            offsets,
+            n_probe,
+            indices=indices,
+            components=components,
+            mean=mean,
+        )
+
+    def _search(self, queries, k):
+        n_probe = min(self.n_probe, len(self.centroids))
+        lists, _ = _top_k(
+            squared_distances(queries, self.centroids, self.centroid_norms), n_probe
+        )
+        # -1 marks slots left empty when the probed groups hold fewer than k rows
+        positions = np.full((len(queries), k), -1, dtype=np.intp)
+        squared = np.full((len(queries), k), np.inf, dtype=np.float32)
+        for row, query_lists in enumerate(lists):
+            candidates = np.concatenate(
+                [np.arange(self.offsets[i], self.offsets[i + 1]) for i in query_lists]
+            )
+            if len(candidates) == 0:
+                continue
+            candidate_squared = squared_distances(
+                queries[row : row + 1],
+                self.vectors[candidates],
+                self.vector_norms[candidates],
+            )
+            nearest, values = _top_k(candidate_squared, k)
+            positions[row, : nearest.shape[1]] = candidates[nearest[0]]
+            squared[row, : nearest.shape[1]] = values[0]
+        return positions, squared
+
+    def _metadata(self):
+        return dict(super()._metadata(), n_probe=self.n_probe)
+
+    def save(self, directory):
+        self._save_arrays(
+            directory,
+            {
+                "vectors": self.vectors,
+                "centroids": self.centroids,
+                "offsets": self.offsets,
+            },
+        )
+
+
+def load_index(directory, mmap=True):
+    """Load an index saved with ``save``, memory-mapping its arrays by default."""
+    with open(os.path.join(directory, "index.json"), encoding="utf-8") as f:
+        metadata = json.load(f)
+    arrays = {
+        name: np.load(
+            os.path.join(directory, f"{name}.npy"), mmap_mode="r" if mmap else None
+        )
+        for name in metadata["arrays"]
+    }
+    space = {name: arrays.get(name) for name in ("indices", "components", "mean")}
+    if metadata["kind"] == "ExactIndex":
+        return ExactIndex(arrays["vectors"], arrays["labels"], **space)
+    if metadata["kind"] == "IVFIndex":
+        return IVFIndex(
+            arrays["vectors"],
+            arrays["labels"],
+            arrays["centroids"],
+            arrays["offsets"],
+            metadata["n_probe"],
+            **space,
+        )
+    raise ValueError(f"Unknown index kind '{metadata['kind']}'.")
@@ -0,0 +1,238 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from scipy.optimize import linear_sum_assignment
+
+from distances import squared_distances
+from instrumentation import instrumented
+from k_cluster import label_dtype, make_kmeans
+from shared_array import SharedArray, init_worker, worker_array
+
+RESAMPLING_METHODS = ("bootstrap", "subsample")
+
+
+class Replicate(NamedTuple):
+    components: np.ndarray
+    explained_variance: np.ndarray
+    centers: np.ndarray
+    labels: np.ndarray
+
+
+class StabilityResult(NamedTuple):
+    """Bootstrap distribution of the PCA loadings and cluster assignments.
+
+    Replicate components are sign- and order-aligned to ``components`` and
+    replicate clusters are matched to the clusters of ``assignments``.
+    """
+
+    components: np.ndarray
+    loadings: np.ndarray
+    loadings_lower: np.ndarray
+    loadings_upper: np.ndarray
+    explained_variance: np.ndarray
+    assignments: np.ndarray
+    labels: np.ndarray
+    frequencies: np.ndarray
+    stability: np.ndarray
+    dimension_names: list
+
+
+def _fit_replicates(seeds, n_components, k, backend, method, fraction):
+    return [
+        fit_replicate(worker_array(), seed, n_components, k, backend, method, fraction)
+        for seed in seeds
+    ]
+
+
+def resample_weights(n_samples, rng, method="bootstrap", fraction=0.8):
+    """Row weights of one resample: draw counts for "bootstrap", 0/1 for "subsample"."""
+    if method == "bootstrap":
+        return np.bincount(rng.integers(0, n_samples, n_samples), minlength=n_samples)
+    if method == "subsample":
+        weights = np.zeros(n_samples, dtype=np.intp)
+        weights[rng.choice(n_samples, int(fraction * n_samples), replace=False)] = 1
+        return weights
+    raise ValueError(f"method must be one of {RESAMPLING_METHODS}.")
+
+
+def weighted_pca(centered, weights, n_components=3):
+    """
+    Leading principal components of the rows of a centered matrix, weighted by row.
+
+    The weighted covariance is one BLAS product and its eigendecomposition is
+    only (d, d), so a resample is never materialized and no SVD of the data runs.
+
+    Returns:
+    - A tuple of (components (n_components, d), explained variance (n_components,)).
+    """
+    weights = np.asarray(weights, dtype=centered.dtype)
+    total = weights.sum()
+    mean = (weights @ centered) / total
+    covariance = (centered.T @ (centered * weights[:, None])).astype(np.float64)
+    covariance /= total
+    covariance -= np.outer(mean, mean)
+    covariance *= total / (total - 1)
+    values, vectors = np.linalg.eigh(covariance)
+    order = np.argsort(values)[::-1][:n_components]
+    return vectors[:, order].T, values[order]
+
+
+def fit_replicate(
+    data, seed, n_components=3, k=3, backend="auto", method="bootstrap", fraction=0.8
+):
+    """Refit PCA and k-means on one resample of the (centered) data matrix."""
+    rng = np.random.default_rng(seed)
+    weights = resample_weights(len(data), rng, method, fraction)
+    components, explained_variance = weighted_pca(data, weights, n_components)
+    kmeans = make_kmeans(k, len(data), backend)
+    kmeans.set_params(random_state=int(rng.integers(2**31 - 1)))
+    kmeans.fit(data, sample_weight=weights)
+    return Replicate(
+        components,
+        explained_variance,
+        kmeans.cluster_centers_,
+        kmeans.labels_.astype(label_dtype(k)),
+    )
+
+
+def align_components(components, reference):
+    """Reorder and flip replicate components to best match the reference components."""
+    similarity = np.abs(reference @ components.T)
+    _, order = linear_sum_assignment(similarity, maximize=True)
+    aligned = components[order]
+    signs = np.sign(np.einsum("ij,ij->i", aligned, reference))
+    signs[signs == 0] = 1
+    return aligned * signs[:, None], order
+
+
+def match_clusters(centers, reference_centers):
+    """Replicate cluster id to reference cluster id, by Hungarian matching of centers."""
+    rows, columns = linear_sum_assignment(squared_distances(centers, reference_centers))
+    mapping = np.empty(len(centers), dtype=label_dtype(len(reference_centers)))
+    mapping[rows] = columns
+    return mapping
+
+
+@instrumented
+def bootstrap_stability(
+    data,
+    dimension_names,
+    indices=None,
+    n_components=3,
+    k=3,
+    n_replicates=200,
+    method="bootstrap",
+    fraction=0.8,
+    backend="auto",
+    confidence=0.95,
+    seed=42,
+    max_workers=None,
+):
+    """
+    Estimate how stable the PCA loadings and k-means clusters are under resampling.
+
+    Every replicate refits PCA (via the weighted covariance fast path) and
+    k-means on a bootstrap or subsample of the respondents, in a process pool
+    attached to one shared-memory copy of the data.
+
+    Parameters:
+    - data: A 2D numpy array where each row is a respondent.
+    - dimension_names: The names of the data columns.
+    - indices: The columns to analyse (defaults to all).
+    - n_components: The number of principal components.
+    - k: The number of clusters.
+    - n_replicates: The number of resamples.
+    - method: "bootstrap" (with replacement) or "subsample" (fraction without).
+    - fraction: The share of respondents per subsample.
+    - backend: "kmeans", "minibatch" or "auto", as in kclusterencoding.
+    - confidence: The coverage of the loading intervals.
+    - seed: Seeds the resamples; results do not depend on max_workers.
+    - max_workers: The number of worker processes (defaults to the CPU count).
+
+    Returns:
+    - A StabilityResult.
+    """
+    if method not in RESAMPLING_METHODS:
+        raise ValueError(f"method must be one of {RESAMPLING_METHODS}.")
+    if indices is not None:
+        data = data[:, indices]
+        dimension_names = [dimension_names[i] for i in indices]
+    mean = data.mean(axis=0, dtype=np.float64)
+    # Centering once keeps the float32 covariance products well conditioned
+    centered = (data - mean).astype(np.float32)
+
+    components, _ = weighted_pca(centered, np.ones(len(centered)), n_components)
+    kmeans = make_kmeans(k, len(centered), backend).fit(centered)
+    reference_centers = kmeans.cluster_centers_
+    assignments = kmeans.labels_
+
+    seeds = np.random.SeedSequence(seed).spawn(n_replicates)
+    max_workers = min(max_workers or os.cpu_count() or 1, n_replicates)
+    batch_size = -(-n_replicates // (4 * max_workers))
+    with SharedArray(centered) as shared:
+        with ProcessPoolExecutor(
+            max_workers, initializer=init_worker, initargs=(shared.spec,)
+        ) as pool:
+            futures = [
+                pool.submit(
+                    _fit_replicates,
+                    seeds[start : start + batch_size],
+                    n_components,
+                    k,
+                    backend,
+                    method,
+                    fraction,
+                )
+                for start in range(0, n_replicates, batch_size)
+            ]
+            replicates = [r for future in futures for r in future.result()]
+
+    loadings = np.empty((n_replicates, n_components, centered.shape[1]))
+    explained_variance = np.empty((n_replicates, n_components))
+    labels = np.empty((n_replicates, len(centered)), dtype=label_dtype(k))
+    for i, replicate in enumerate(replicates):
+        loadings[i], order = align_components(replicate.components, components)
+        explained_variance[i] = replicate.explained_variance[order]
+        labels[i] = match_clusters(replicate.centers, reference_centers)[
+            replicate.labels
+        ]
+
+    tail = (1 - confidence) / 2
+    lower, upper = np.quantile(loadings, [tail, 1 - tail], axis=0)
+    frequencies = np.empty((len(centered), k))
+    for cluster in range(k):
+        frequencies[:, cluster] = (labels == cluster).mean(axis=0)
+    stability = frequencies[np.arange(len(centered)), assignments]
+    return StabilityResult(
+        components,
+        loadings,
+        lower,
+        upper,
+        explained_variance,
+        assignments,
+        labels,
+        frequencies,
+        stability,
+        list(dimension_names),
+    )
+
+
+def co_assignment(labels, rows):
+    """Share of replicates in which each pair of the given respondents share a cluster."""
+    selected = labels[:, rows]
+    return (selected[:, :, None] == selected[:, None, :]).mean(axis=0)
+
+
+def print_loading_intervals(result, component=0, k=10):
+    """Prints the k largest loadings of a component with their intervals."""
+    loadings = result.components[component]
+    lines = [f"Principal Component {component + 1}:"]
+    for i in np.argsort(-np.abs(loadings), kind="stable")[:k]:
+        lines.append(
+            f"  {result.dimension_names[i]}: {loadings[i]:.2f} "
+            f"[{result.loadings_lower[component, i]:.2f}, "
+            f"{result.loadings_upper[component, i]:.2f}]"
+        )
+    print("\n".join(lines))
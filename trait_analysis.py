@@ -0,0 +1,232 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+import numpy as np
+from sklearn.decomposition import PCA
+
+from general_data import dimension_names
+from instrumentation import instrumented
+from k_cluster import make_kmeans
+from pca_tools import PCALoadings
+from personality_profile import TRAIT_OFFSETS, TRAIT_WIDTH
+from shared_array import SharedArray, init_worker, worker_array
+
+
+class TraitResult(NamedTuple):
+    trait: str
+    loadings: PCALoadings
+    explained_variance_ratio: np.ndarray
+    centers: np.ndarray
+    cluster_sizes: np.ndarray
+
+
+class HierarchicalResult(NamedTuple):
+    """Per-trait fits plus the fit of their combined block scores.
+
+    ``block_scores`` holds the facet PCA scores of every trait side by side,
+    ``block_clusters`` the per-trait cluster of every respondent (one column
+    per trait) and ``scores``/``clusters`` the PCA and k-means of the block scores.
+    """
+
+    traits: list
+    block_scores: np.ndarray
+    block_clusters: np.ndarray
+    scores: np.ndarray
+    clusters: np.ndarray
+    loadings: PCALoadings
+
+
+class OverallResult(NamedTuple):
+    scores: np.ndarray
+    clusters: np.ndarray
+    loadings: PCALoadings
+
+
+def facet_columns(trait):
+    """The (contiguous) columns of a trait's facets in a profile row."""
+    start = TRAIT_OFFSETS[trait] + 1
+    return slice(start, start + TRAIT_WIDTH - 1)
+
+
+def overall_columns():
+    """The overall score columns, as a slice so selecting them is a view."""
+    return slice(0, len(dimension_names), TRAIT_WIDTH)
+
+
+def _selected(data, columns, scaler):
+    block = data[:, columns]
+    if scaler is None:
+        return block
+    indices = np.arange(data.shape[1])[columns]
+    return scaler.transform(block, indices)
+
+
+def fit_trait(
+    data, trait, n_components=1, k=3, backend="auto", scaler=None, solver="auto"
+):
+    """
+    Fit PCA and k-means on the facets of one trait (PCA only when k is None).
+
+    Returns:
+    - A tuple of (TraitResult, facet PCA scores (n, n_components), clusters (n,) or None).
+    """
+    columns = facet_columns(trait)
+    block = _selected(data, columns, scaler)
+    pca = PCA(n_components=n_components, svd_solver=solver, random_state=42)
+    scores = pca.fit_transform(block)
+    centers = clusters = sizes = None
+    if k is not None:
+        kmeans = make_kmeans(k, len(block), backend).fit(block)
+        centers, clusters = kmeans.cluster_centers_, kmeans.labels_
+        sizes = np.bincount(clusters, minlength=k)
+    result = TraitResult(
+        trait,
+        PCALoadings(pca.components_, dimension_names[columns]),
+        pca.explained_variance_ratio_,
+        centers,
+        sizes,
+    )
+    return result, scores, clusters
+
+
+def _fit_trait(position, trait, n_components, k, backend, scaler, solver):
+    data, block_scores, block_clusters = (worker_array(i) for i in range(3))
+    result, scores, clusters = fit_trait(
+        data, trait, n_components, k, backend, scaler, solver
+    )
+    # Results are written into the shared outputs, only the summary is pickled back
+    block_scores[:, position * n_components : (position + 1) * n_components] = scores
+    if clusters is not None:
+        block_clusters[:, position] = clusters
+    return result
+
+
+@instrumented
+def hierarchical_analysis(
+    data,
+    n_components=3,
+    k=3,
+    trait_components=1,
+    trait_k=3,
+    backend="auto",
+    scaler=None,
+    solver="auto",
+    max_workers=None,
+):
+    """
+    Analyse the five traits separately, then combine their block scores.
+
+    Every trait's six facets get their own PCA and k-means, fitted in parallel
+    worker processes attached to one shared-memory copy of the data. The
+    ``trait_components`` facet scores of all traits are then concatenated and
+    fitted once more. The facet PCAs and the combined fit each cost a small
+    fraction of one PCA of all 30 facets; k-means dominates, and each per-trait
+    k-means costs about half a 30-facet one, so with a worker per trait the wall
+    time is about that of one clustering. ``trait_k=None`` skips the per-trait
+    clustering when only the combined clusters are needed.
+
+    Parameters:
+    - data: A 2D numpy array of full profile rows (e.g. general_data.data).
+    - n_components: The number of combined principal components.
+    - k: The number of combined clusters.
+    - trait_components: The number of principal components per trait.
+    - trait_k: The number of clusters per trait, or None for no per-trait clustering.
+    - backend: "kmeans", "minibatch" or "auto", as in kclusterencoding.
+    - scaler: A fitted scaling.Scaler over the columns of data.
+    - solver: The PCA svd_solver of the per-trait and combined fits.
+    - max_workers: The number of worker processes (defaults to the CPU count, at most 5).
+
+    Returns:
+    - A HierarchicalResult.
+    """
+    traits = list(TRAIT_OFFSETS)
+    max_workers = min(max_workers or os.cpu_count() or 1, len(traits))
+    block_scores = np.empty((len(data), len(traits) * trait_components))
+    block_clusters = np.full((len(data), len(traits)), -1, dtype=np.intp)
+    if max_workers == 1:
+        results = []
+        for position, trait in enumerate(traits):
+            result, scores, clusters = fit_trait(
+                data, trait, trait_components, trait_k, backend, scaler, solver
+            )
+            block_scores[
+                :, position * trait_components : (position + 1) * trait_components
+            ] = scores
+            if clusters is not None:
+                block_clusters[:, position] = clusters
+            results.append(result)
+    else:
+        with SharedArray(data) as shared_data, SharedArray(
+            block_scores
+        ) as shared_scores, SharedArray(block_clusters) as shared_clusters:
+            with ProcessPoolExecutor(
+                max_workers,
+                initializer=init_worker,
+                initargs=(shared_data.spec, shared_scores.spec, shared_clusters.spec),
+            ) as pool:
+                futures = [
+                    pool.submit(
+                        _fit_trait,
+                        position,
+                        trait,
+                        trait_components,
+                        trait_k,
+                        backend,
+                        scaler,
+                        solver,
+                    )
+                    for position, trait in enumerate(traits)
+                ]
+                results = [future.result() for future in futures]
+            block_scores[...] = shared_scores.array
+            block_clusters[...] = shared_clusters.array
+
+    pca = PCA(n_components=n_components, svd_solver=solver, random_state=42)
+    scores = pca.fit_transform(block_scores)
+    clusters = make_kmeans(k, len(block_scores), backend).fit(block_scores).labels_
+    names = [f"{trait}_pc{i + 1}" for trait in traits for i in range(trait_components)]
+    return HierarchicalResult(
+        results,
+        block_scores,
+        block_clusters if trait_k is not None else None,
+        scores,
+        clusters,
+        PCALoadings(pca.components_, names),
+    )
+
+
+@instrumented
+def overall_analysis(
+    data, n_components=3, k=3, backend="auto", scaler=None, solver="auto"
+):
+    """
+    Fast path: PCA and k-means on the five overall scores only.
+
+    Returns:
+    - An OverallResult of PCA scores, clusters and loadings.
+    """
+    columns = overall_columns()
+    overall = _selected(data, columns, scaler)
+    pca = PCA(n_components=n_components, svd_solver=solver, random_state=42)
+    scores = pca.fit_transform(overall)
+    clusters = make_kmeans(k, len(overall), backend).fit(overall).labels_
+    return OverallResult(
+        scores, clusters, PCALoadings(pca.components_, dimension_names[columns])
+    )
+
+
+def print_trait_breakdown(result, k=3):
+    """Prints the per-trait loadings, explained variance and cluster sizes."""
+    lines = []
+    for trait in result.traits:
+        explained = ", ".join(
+            f"{ratio:.2f}" for ratio in trait.explained_variance_ratio
+        )
+        header = f"{trait.trait} (explained variance {explained}"
+        if trait.cluster_sizes is not None:
+            sizes = ", ".join(str(size) for size in trait.cluster_sizes)
+            header += f"; cluster sizes {sizes}"
+        lines.append(header + ")")
+        lines.append(trait.loadings.format(k))
+    print("\n".join(lines))